@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .models import normalize_email_key
+
+
+class EmailBackend(ModelBackend):
+    """
+    Sign in with email and password: authenticate(request, email=..., password=...).
+    The user is resolved by one lookup on the unique email_key index; calls
+    without `email` fall through to the next backend (username login).
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        key = normalize_email_key(email)
+        if key is None or password is None:
+            return None
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.get(email_key=key)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so an unknown email takes as long as a wrong password.
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -3,8 +3,8 @@ from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.contrib.auth import authenticate
-from django.contrib.auth.models import User
 
+from .models import normalize_email_key
 
 User = get_user_model()
 
@@ -20,7 +20,7 @@ class CustomUserCreationForm(UserCreationForm):
     
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        if User.objects.filter(email_key=normalize_email_key(email)).exists():
             raise ValidationError("A user with that email already exists.")
         return email
 
@@ -32,14 +32,11 @@ class CustomAuthenticationForm(AuthenticationForm):
         password = self.cleaned_data.get('password')
 
         if email and password:
-            try:
-                user_obj = User.objects.get(email=email)
-            except User.DoesNotExist:
-                raise forms.ValidationError("Invalid email or password")
-
-            self.user_cache = authenticate(username=user_obj.username, password=password)
+            # EmailBackend: one indexed lookup on email_key, then the hash check.
+            self.user_cache = authenticate(self.request, email=email, password=password)
             if self.user_cache is None:
                 raise forms.ValidationError("Invalid email or password")
+            self.confirm_login_allowed(self.user_cache)
 
         return self.cleaned_data
     
@@ -61,7 +58,7 @@ class ForgotPasswordForm(forms.Form):
     
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if not User.objects.filter(email=email).exists():
+        if not User.objects.filter(email_key=normalize_email_key(email)).exists():
             raise ValidationError("No account found with this email address.")
         return email
     
\ No newline at end of file
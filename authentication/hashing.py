@@ -0,0 +1,12 @@
+"""
+Password hashing for worker processes. Only the hasher class is imported, so
+this runs without Django settings being configured (see
+authentication.provisioning.hash_passwords).
+"""
+from django.utils.module_loading import import_string
+
+
+def encode_passwords(hasher_path, passwords):
+    """Hash each password with a fresh salt using the hasher class at `hasher_path`."""
+    hasher = import_string(hasher_path)()
+    return [hasher.encode(password, hasher.salt()) for password in passwords]
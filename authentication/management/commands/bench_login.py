@@ -0,0 +1,82 @@
+import random
+import time
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from authentication.models import User, normalize_email_key
+
+HASHERS = {
+    'md5': 'django.contrib.auth.hashers.MD5PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD = 'bench-password'
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _two_step(email):
+    # The former CustomAuthenticationForm.clean(): find the username, then authenticate by it.
+    try:
+        user = User.objects.get(email=email)
+    except User.DoesNotExist:
+        return None
+    return authenticate(username=user.username, password=PASSWORD)
+
+
+def _email_backend(email):
+    return authenticate(email=email, password=PASSWORD)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare logins per second and queries per login of the email lookup + username "
+        "authenticate path against EmailBackend on seeded users (changes are rolled back)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000, help="Users to seed before measuring.")
+        parser.add_argument('--logins', type=int, default=2000)
+        parser.add_argument(
+            '--hasher', choices=sorted(HASHERS), default='md5',
+            help="Password hasher for the seeded users; md5 keeps hashing out of the measurement.",
+        )
+
+    def handle(self, *args, **options):
+        with override_settings(PASSWORD_HASHERS=[HASHERS[options['hasher']]]):
+            try:
+                with transaction.atomic():
+                    self._run(options)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, options):
+        password = make_password(PASSWORD)
+        emails = [f"bench.login.{i}@example.com" for i in range(options['users'])]
+        User.objects.bulk_create(
+            [
+                User(username=f"bench_login_{i}", email=email, email_key=normalize_email_key(email),
+                     password=password, user_type='employee')
+                for i, email in enumerate(emails)
+            ],
+            batch_size=1000,
+        )
+        sample = random.Random(0).choices(emails, k=options['logins'])
+
+        self.stdout.write(f"{'path':<24} {'logins/s':>10} {'queries/login':>14}")
+        for label, login in (('email + username', _two_step), ('EmailBackend', _email_backend)):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for email in sample:
+                    if login(email) is None:
+                        raise RuntimeError(f"{label}: login failed for {email}")
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{label:<24} {len(sample) / elapsed:>10.0f} {len(queries) / len(sample):>14.2f}"
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from authentication.otp import PURGE_BATCH_SIZE, get_code_store
+
+
+class Command(BaseCommand):
+    help = "Delete expired and used two-factor codes (a no-op for the cache store, which expires them itself)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = get_code_store().purge_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} two-factor code(s)."))
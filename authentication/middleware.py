@@ -0,0 +1,98 @@
+"""
+AuthenticationMiddleware that resolves request.user from a cache instead of
+loading the User row on every request.
+
+Entries are keyed by user id and hold the user together with its session
+auth hash; one is only used when that hash matches the session's, just as
+django.contrib.auth.get_user() checks it. Each user also has a version
+stamp, replaced whenever the User is saved or deleted (authentication.signals),
+and an entry is only used while it carries the current stamp. The stamp is
+read before the row is loaded, so a request that loaded the row just before
+a change committed caches it under the old stamp, never serving it again. A
+changed password, a deactivation, a demotion or a toggled 2FA setting thus
+takes effect on the next request in every worker.
+With AUTH_USER_CACHE_TIMEOUT = 0 every request loads the user as usual.
+"""
+import uuid
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def _users():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def _cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def _version_key(user_id):
+    return f'auth-user-version:{user_id}'
+
+
+def _current_version(user_id):
+    """The user's version stamp, creating one if the cache has none."""
+    users = _users()
+    version = users.get(_version_key(user_id))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not users.add(_version_key(user_id), version, settings.AUTH_USER_CACHE_TIMEOUT):
+            version = users.get(_version_key(user_id))
+    return version
+
+
+def invalidate_cached_users(user_ids):
+    if settings.AUTH_USER_CACHE_TIMEOUT <= 0:
+        return
+    _users().set_many(
+        {_version_key(user_id): uuid.uuid4().hex for user_id in user_ids},
+        settings.AUTH_USER_CACHE_TIMEOUT,
+    )
+
+
+def get_cached_user(request):
+    if settings.AUTH_USER_CACHE_TIMEOUT <= 0:
+        return auth.get_user(request)
+    session = request.session
+    try:
+        user_id = session[SESSION_KEY]
+        backend_path = session[BACKEND_SESSION_KEY]
+        session_hash = session[HASH_SESSION_KEY]
+    except KeyError:
+        return auth.get_user(request)
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return auth.get_user(request)
+
+    version = _current_version(user_id)
+    entry = _users().get(_cache_key(user_id))
+    if entry is not None and entry[0] == version and constant_time_compare(entry[1], session_hash):
+        return entry[2]
+
+    # Miss or stale hash: the regular lookup and verification (which also
+    # handles SECRET_KEY_FALLBACKS and flushes sessions that fail it).
+    user = auth.get_user(request)
+    if user.is_authenticated and request.session.get(HASH_SESSION_KEY) == user.get_session_auth_hash():
+        entry = (version, user.get_session_auth_hash(), user)
+        _users().set(_cache_key(user_id), entry, settings.AUTH_USER_CACHE_TIMEOUT)
+    return user
+
+
+async def aget_cached_user(request):
+    return await sync_to_async(get_cached_user)(request)
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """Drop-in replacement for django.contrib.auth.middleware.AuthenticationMiddleware."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+        request.auser = partial(aget_cached_user, request)
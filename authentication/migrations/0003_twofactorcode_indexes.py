@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='twofactorcode',
+            index=models.Index(fields=['user', 'code', 'is_used'], name='twofactor_user_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='twofactorcode',
+            index=models.Index(fields=['expires_at'], name='twofactor_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:44
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def _duplicate_address(email, pk, claimed):
+    """A free variant of a duplicate address: local+duplicate-<pk>@domain."""
+    local, at, domain = email.strip().rpartition('@')
+    if not at:
+        local, domain = email.strip(), ''
+    suffix, attempt = f'+duplicate-{pk}', 0
+    while True:
+        tail = (suffix if not attempt else f'{suffix}-{attempt}') + (f'@{domain}' if domain else '')
+        candidate = local[:254 - len(tail)] + tail
+        if candidate.lower() not in claimed:
+            return candidate
+        attempt += 1
+
+
+def backfill_email_key(apps, schema_editor):
+    """
+    Fill email_key for existing users. Where several accounts share an email
+    (case-insensitively), the active one that logged in most recently (then
+    the oldest) keeps it; the others are moved to local+duplicate-<pk>@domain,
+    which stays recognisable and lets save() keep email_key unique.
+    """
+    User = apps.get_model('authentication', 'User')
+    claimed = set()
+    duplicates = []
+    users = User.objects.exclude(email='').order_by(
+        '-is_active', F('last_login').desc(nulls_last=True), 'pk'
+    ).values_list('pk', 'email')
+    for pk, email in users.iterator(chunk_size=2000):
+        key = email.strip().lower()
+        if not key:
+            continue
+        if key in claimed:
+            duplicates.append((pk, email))
+        else:
+            claimed.add(key)
+            User.objects.filter(pk=pk).update(email_key=key)
+    for pk, email in duplicates:
+        address = _duplicate_address(email, pk, claimed)
+        claimed.add(address.lower())
+        User.objects.filter(pk=pk).update(email=address, email_key=address.lower())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_twofactorcode_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_key',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True),
+        ),
+        migrations.RunPython(backfill_email_key, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='email_key',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True, unique=True),
+        ),
+    ]
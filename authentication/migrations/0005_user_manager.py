@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:03
+
+import authentication.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_user_email_key'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', authentication.models.UserManager()),
+            ],
+        ),
+    ]
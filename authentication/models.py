@@ -1,7 +1,26 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
+from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+EMAIL_TAKEN_MESSAGE = "A user with that email already exists."
+
+
+def normalize_email_key(email):
+    """Case-insensitive lookup key for an email address (None when blank)."""
+    return (email or '').strip().lower() or None
+
+
+class UserManager(BaseUserManager):
+    def _create_user(self, username, email, password, **extra_fields):
+        # A taken email is a validation error (createsuperuser reports it as
+        # such), not an IntegrityError from the email_key index.
+        key = normalize_email_key(email)
+        if key and self.filter(email_key=key).exists():
+            raise ValidationError({'email': EMAIL_TAKEN_MESSAGE})
+        return super()._create_user(username, email, password, **extra_fields)
+
+
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
         ('employee', 'Employee'),
@@ -16,16 +35,43 @@ class User(AbstractUser):
         ('sms', 'SMS'),
         ('authenticator', 'Authenticator App'),
     ], blank=True)
+    # Not bumped by login (last_login only); drives incremental backups.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # normalize_email_key(email), kept in sync by save(); the unique index
+    # behind email login (authentication.backends.EmailBackend).
+    email_key = models.CharField(max_length=254, unique=True, null=True, blank=True, editable=False)
+
+    objects = UserManager()
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.get_user_type_display()})"
 
+    def clean(self):
+        super().clean()
+        key = normalize_email_key(self.email)
+        if key and User._default_manager.filter(email_key=key).exclude(pk=self.pk).exists():
+            raise ValidationError({'email': EMAIL_TAKEN_MESSAGE})
+
+    def save(self, *args, **kwargs):
+        self.email_key = normalize_email_key(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'email_key'}
+        super().save(*args, **kwargs)
+
 class TwoFactorCode(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_used = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Code check (see authentication.otp) and expiry sweep.
+            models.Index(fields=['user', 'code', 'is_used'], name='twofactor_user_code_idx'),
+            models.Index(fields=['expires_at'], name='twofactor_expires_idx'),
+        ]
     
     def __str__(self):
         return f"2FA code for {self.user.username}"
@@ -0,0 +1,114 @@
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .models import TwoFactorCode
+
+# verify() results
+VALID = 'valid'
+EXPIRED = 'expired'
+INVALID = 'invalid'
+
+PURGE_BATCH_SIZE = 1000
+
+
+def generate_code():
+    return ''.join(secrets.choice('0123456789') for _ in range(6))
+
+
+def code_ttl():
+    return timedelta(minutes=settings.TWO_FACTOR_CODE_TTL_MINUTES)
+
+
+class DatabaseCodeStore:
+    """
+    Codes in the TwoFactorCode table. Issuing replaces the user's previous
+    codes and a successful check consumes the code, so each user has at most
+    one row; purge_expired() sweeps the rest.
+    """
+
+    def issue(self, user):
+        code = generate_code()
+        with transaction.atomic():
+            TwoFactorCode.objects.filter(user=user).delete()
+            TwoFactorCode.objects.create(user=user, code=code, expires_at=timezone.now() + code_ttl())
+        return code
+
+    def verify(self, user, code):
+        # One conditional DELETE: only one of two concurrent submissions wins.
+        deleted, _ = TwoFactorCode.objects.filter(
+            user=user, code=code, is_used=False, expires_at__gt=timezone.now()
+        ).delete()
+        if deleted:
+            return VALID
+        if TwoFactorCode.objects.filter(user=user, code=code, is_used=False).exists():
+            return EXPIRED
+        return INVALID
+
+    def purge_expired(self, batch_size=PURGE_BATCH_SIZE):
+        """Delete expired and used codes in primary-key batches. Returns the number deleted."""
+        stale = TwoFactorCode.objects.filter(expires_at__lte=timezone.now()) | TwoFactorCode.objects.filter(is_used=True)
+        total = 0
+        while True:
+            pks = list(stale.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return total
+            total += TwoFactorCode.objects.filter(pk__in=pks).delete()[0]
+
+
+class CacheCodeStore:
+    """
+    Codes in a cache with native TTL: one key per user, so issuing a code
+    overwrites the previous one and nothing ever needs purging.
+    """
+    # Entries outlive their expiry by this much so a late attempt is told
+    # "expired" rather than "invalid".
+    EXPIRED_GRACE = timedelta(minutes=10)
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def _key(self, user):
+        return f'2fa-code:{user.pk}'
+
+    def issue(self, user):
+        code = generate_code()
+        expires_at = timezone.now() + code_ttl()
+        self.cache.set(
+            self._key(user), (code, expires_at.timestamp()),
+            timeout=(code_ttl() + self.EXPIRED_GRACE).total_seconds(),
+        )
+        return code
+
+    def verify(self, user, code):
+        entry = self.cache.get(self._key(user))
+        if entry is None or not constant_time_compare(entry[0], code):
+            return INVALID
+        if timezone.now().timestamp() >= entry[1]:
+            return EXPIRED
+        # delete() reports whether this call removed the key: the code is single use.
+        return VALID if self.cache.delete(self._key(user)) else INVALID
+
+    def purge_expired(self, batch_size=PURGE_BATCH_SIZE):
+        return 0
+
+
+_stores = {}
+
+
+def get_code_store():
+    """The store selected by settings.TWO_FACTOR_STORE ('db' or 'cache')."""
+    backend = settings.TWO_FACTOR_STORE
+    if backend not in _stores:
+        if backend == 'db':
+            _stores[backend] = DatabaseCodeStore()
+        elif backend == 'cache':
+            _stores[backend] = CacheCodeStore(settings.TWO_FACTOR_CACHE_ALIAS)
+        else:
+            raise ValueError(f"Unknown TWO_FACTOR_STORE: {backend!r}")
+    return _stores[backend]
@@ -0,0 +1,114 @@
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.urls import reverse
+from django.utils.encoding import force_bytes, force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .hashing import encode_passwords
+
+# settings.ACCOUNT_PROVISIONING values
+ACTIVATION = 'activation'
+PASSWORD = 'password'
+
+# Below this many passwords the pool's start-up and pickling cost more than it saves.
+POOL_MIN_PASSWORDS = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def provisioning_mode():
+    mode = settings.ACCOUNT_PROVISIONING
+    if mode not in (ACTIVATION, PASSWORD):
+        raise ValueError(f"Unknown ACCOUNT_PROVISIONING: {mode!r}")
+    return mode
+
+
+def temporary_password():
+    return secrets.token_urlsafe(9)
+
+
+def initial_password():
+    """
+    First password for one new account, for create_user(): None (an unusable
+    password, no hashing) in activation mode, a temporary one otherwise.
+    """
+    return None if provisioning_mode() == ACTIVATION else temporary_password()
+
+
+def _hash_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        return _pool
+
+
+def hash_passwords(passwords):
+    """
+    make_password() for many passwords, split into one chunk per worker of
+    the PASSWORD_HASH_WORKERS process pool (inline when that is 0 or the
+    list is short).
+    """
+    passwords = list(passwords)
+    workers = settings.PASSWORD_HASH_WORKERS
+    if workers <= 0 or len(passwords) < POOL_MIN_PASSWORDS:
+        return [make_password(password) for password in passwords]
+    hasher = type(get_hasher('default'))
+    hasher_path = f'{hasher.__module__}.{hasher.__qualname__}'
+    size = -(-len(passwords) // workers)
+    chunks = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+    futures = [_hash_pool().submit(encode_passwords, hasher_path, chunk) for chunk in chunks]
+    return [encoded for future in futures for encoded in future.result()]
+
+
+def initial_passwords(count):
+    """
+    (plain, encoded) first passwords for `count` new accounts that are
+    bulk-created (bypassing set_password). Activation mode yields no plain
+    password and an unusable hash; password mode yields random temporary
+    passwords hashed across the process pool.
+    """
+    if provisioning_mode() == ACTIVATION:
+        return [(None, make_password(None)) for _ in range(count)]
+    plain = [temporary_password() for _ in range(count)]
+    return list(zip(plain, hash_passwords(plain)))
+
+
+# ------------------------------
+# Activation tokens
+# ------------------------------
+def activation_path(user):
+    """
+    One-time link for setting the first password. The token is tied to the
+    current password hash, so it stops working once a password is set.
+    """
+    return reverse('activate_account', kwargs={
+        'uidb64': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+    })
+
+
+def user_for_activation(uidb64, token):
+    """The user an activation link is for, or None if it is invalid or used."""
+    User = get_user_model()
+    try:
+        user = User._default_manager.get(pk=force_str(urlsafe_base64_decode(uidb64)))
+    except (TypeError, ValueError, OverflowError, User.DoesNotExist):
+        return None
+    if not default_token_generator.check_token(user, token):
+        return None
+    return user
+
+
+def credentials(user, password):
+    """What to hand over to a new account holder: the temporary password or the activation link."""
+    if password is None:
+        return {'activation_path': activation_path(user)}
+    return {'temporary_password': password}
@@ -0,0 +1,164 @@
+import hashlib
+import ipaddress
+import itertools
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+from .models import normalize_email_key
+
+
+def _trusted(address):
+    try:
+        address = ipaddress.ip_address(address.strip())
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(proxy, strict=False) for proxy in settings.RATE_LIMIT_TRUSTED_PROXIES)
+
+
+def _client_ip(request):
+    """
+    REMOTE_ADDR, or behind trusted proxies the right-most X-Forwarded-For hop
+    that is not one of them (entries further left are client-supplied).
+    """
+    address = request.META.get('REMOTE_ADDR') or ''
+    if not _trusted(address):
+        return address
+    for hop in reversed(request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')):
+        hop = hop.strip()
+        if hop:
+            address = hop
+            if not _trusted(hop):
+                break
+    return address
+
+
+def _email(request):
+    # The login form's email field is called 'username'
+    return normalize_email_key(request.POST.get('username'))
+
+
+def _session(request):
+    # The cookie value: reading it does not load the session from the database
+    return request.session.session_key
+
+
+KEY_FUNCTIONS = {'ip': _client_ip, 'email': _email, 'session': _session}
+
+
+class LocalBackend:
+    """
+    Counters in this worker process. Increments are next() on an
+    itertools.count, which is atomic under the GIL, so hits take no lock.
+    Counts are per process: with N workers a client gets up to N times the limit.
+    """
+
+    def __init__(self):
+        # (window, window index) -> {key: itertools.count}, and the last value
+        # each counter returned, for reading the previous window.
+        self._counters = {}
+        self._totals = {}
+
+    def _bucket(self, window, index):
+        slot = (window, index)
+        bucket = self._counters.get(slot)
+        if bucket is None:
+            bucket = self._counters.setdefault(slot, {})
+            for stale in list(self._counters):
+                if stale[0] == window and stale[1] < index - 1:
+                    self._counters.pop(stale, None)
+                    self._totals.pop(stale, None)
+        return bucket
+
+    def hit(self, key, window, index):
+        bucket = self._bucket(window, index)
+        counter = bucket.get(key) or bucket.setdefault(key, itertools.count(1))
+        current = next(counter)
+        self._totals.setdefault((window, index), {})[key] = current
+        previous = self._totals.get((window, index - 1), {}).get(key, 0)
+        return previous, current
+
+
+class CacheBackend:
+    """Counters in a Django cache (shared by all workers when the cache is)."""
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def hit(self, key, window, index):
+        current_key = f'ratelimit:{key}:{window}:{index}'
+        self.cache.add(current_key, 0, timeout=window * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:  # expired between add() and incr()
+            self.cache.set(current_key, 1, timeout=window * 2)
+            current = 1
+        previous = self.cache.get(f'ratelimit:{key}:{window}:{index - 1}', 0)
+        return previous, current
+
+
+_backends = {}
+
+
+def get_backend():
+    """The backend selected by settings.RATE_LIMIT_BACKEND ('local' or 'cache')."""
+    backend = settings.RATE_LIMIT_BACKEND
+    if backend not in _backends:
+        if backend == 'local':
+            _backends[backend] = LocalBackend()
+        elif backend == 'cache':
+            _backends[backend] = CacheBackend(settings.RATE_LIMIT_CACHE_ALIAS)
+        else:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend!r}")
+    return _backends[backend]
+
+
+def check(scope, request):
+    """
+    Count this request against every settings.RATE_LIMITS rule of `scope`.
+    Returns None when it may proceed, else the number of seconds to wait.
+    Refused requests count too, so a client that keeps hammering stays locked out.
+
+    Sliding window: the previous fixed window's count is weighted by how much
+    of it still overlaps the last `window` seconds, plus the current count.
+    """
+    backend = get_backend()
+    now = time.time()
+    retry_after = None
+    for name, limit, window in settings.RATE_LIMITS[scope]:
+        value = KEY_FUNCTIONS[name](request)
+        if not value:
+            continue
+        key = f"{scope}:{name}:{hashlib.sha256(value.encode()).hexdigest()[:32]}"
+        index, offset = divmod(now, window)
+        previous, current = backend.hit(key, window, int(index))
+        if previous * (1 - offset / window) + current > limit:
+            retry_after = max(retry_after or 0, math.ceil(window - offset))
+    return retry_after
+
+
+def rate_limit(scope, methods=('POST',), json=False):
+    """
+    Refuse requests over the `scope` limits with a 429 before the view runs,
+    i.e. before any password hashing, code lookup or session load.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if settings.RATE_LIMIT_ENABLED and request.method in methods:
+                retry_after = check(scope, request)
+                if retry_after is not None:
+                    message = f'Too many attempts. Please try again in {retry_after} seconds.'
+                    if json:
+                        response = JsonResponse({'success': False, 'message': message}, status=429)
+                    else:
+                        response = HttpResponse(message, status=429, content_type='text/plain')
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,167 @@
+"""
+Database sessions with a bounded in-process LRU in front of the table
+(SESSION_ENGINE = 'authentication.session_store').
+
+Every write still goes to the database first (write-through), so restarting
+a worker loses nothing. Each write also stamps the session with a new random
+version in the SESSION_VERSION_CACHE_ALIAS cache; a worker serves its copy
+only while the stamp still matches, so a change made by another worker (a
+login, a logout, a flush) is picked up by that worker's next read.
+
+With SESSION_LRU_SIZE = 0 there is no LRU and no stamps: this is the plain
+database engine plus the batched clear_expired().
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.utils import timezone
+
+CLEAR_EXPIRED_BATCH_SIZE = 1000
+# A save that only moves expire_date (same data) rewrites the row at most
+# this often; the row may then expire up to this much before the cookie.
+TOUCH_INTERVAL = timedelta(minutes=5)
+
+
+class _LRU:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if settings.SESSION_LRU_SIZE <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.SESSION_LRU_SIZE:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+# session_key -> (version, session_data, expire_date), per worker process
+_sessions = _LRU()
+
+
+def _lru_enabled():
+    return settings.SESSION_LRU_SIZE > 0
+
+
+def _versions():
+    return caches[settings.SESSION_VERSION_CACHE_ALIAS]
+
+
+def _version_key(session_key):
+    return f'session-version:{session_key}'
+
+
+def _current_version(session_key):
+    """The session's version stamp, creating one if the cache has none (e.g. after a restart)."""
+    versions = _versions()
+    version = versions.get(_version_key(session_key))
+    if version is None:
+        version = uuid.uuid4().hex
+        if not versions.add(_version_key(session_key), version, timeout=settings.SESSION_COOKIE_AGE):
+            version = versions.get(_version_key(session_key))
+    return version
+
+
+def _bump_version(session_key):
+    version = uuid.uuid4().hex
+    _versions().set(_version_key(session_key), version, timeout=settings.SESSION_COOKIE_AGE)
+    return version
+
+
+class SessionStore(DBStore):
+    def _cached_entry(self, version):
+        entry = _sessions.get(self.session_key)
+        if entry is None or version is None or entry[0] != version or entry[2] <= timezone.now():
+            return None
+        return entry
+
+    def load(self):
+        if not _lru_enabled():
+            return super().load()
+        # The stamp is read before the row: a copy is never labelled with a
+        # version newer than its data, at worst older (and reloaded next time).
+        session_key = self.session_key
+        version = _current_version(session_key)
+        entry = self._cached_entry(version)
+        if entry is not None:
+            return self.decode(entry[1])
+
+        s = self._get_session_from_db()
+        if s is None:
+            _sessions.pop(session_key)
+            return {}
+        if version is not None:
+            _sessions.put(session_key, (version, s.session_data, s.expire_date))
+        return self.decode(s.session_data)
+
+    def create_model_instance(self, data):
+        obj = super().create_model_instance(data)
+        self._written = obj
+        return obj
+
+    def _unchanged(self):
+        """True when saving would only push expire_date forward by less than TOUCH_INTERVAL."""
+        if not _lru_enabled():
+            return False
+        entry = self._cached_entry(_current_version(self.session_key))
+        if entry is None:
+            return False
+        return (
+            self.decode(entry[1]) == self._get_session()
+            and self.get_expiry_date() - entry[2] < TOUCH_INTERVAL
+        )
+
+    def save(self, must_create=False):
+        if self.session_key is not None and not must_create and self._unchanged():
+            return
+        super().save(must_create=must_create)
+        obj = getattr(self, '_written', None)
+        if _lru_enabled() and obj is not None and obj.session_key == self.session_key:
+            _sessions.put(obj.session_key, (_bump_version(obj.session_key), obj.session_data, obj.expire_date))
+
+    def delete(self, session_key=None):
+        session_key = session_key if session_key is not None else self.session_key
+        super().delete(session_key)
+        if _lru_enabled() and session_key is not None:
+            _sessions.pop(session_key)
+            _versions().delete(_version_key(session_key))
+
+    # The async variants go through the same tier (this project runs under WSGI).
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        await sync_to_async(self.save)(must_create=must_create)
+
+    async def adelete(self, session_key=None):
+        await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=CLEAR_EXPIRED_BATCH_SIZE):
+        """Delete expired rows in primary-key batches, so no long lock is held on the table."""
+        model = cls.get_model_class()
+        expired = model.objects.filter(expire_date__lt=timezone.now())
+        while True:
+            keys = list(expired.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not keys:
+                return
+            model.objects.filter(pk__in=keys).delete()
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .middleware import invalidate_cached_users
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def drop_cached_user(sender, instance, **kwargs):
+    # After commit: a request that loads the row before then caches it under
+    # the stamp this replaces.
+    transaction.on_commit(lambda: invalidate_cached_users([instance.pk]))
@@ -1,3 +1,342 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.contrib.auth.hashers import check_password
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import otp, provisioning, ratelimit, session_store
+from .middleware import get_cached_user, invalidate_cached_users
+from .models import TwoFactorCode, User
+from .session_store import SessionStore
+
+
+# Every cache is swapped for a local-memory one (so clearing it in a test
+# cannot touch the real on-disk caches), with the session LRU and the
+# request.user cache switched on as they are with SHARED_CACHE_URL set.
+_test_caches = override_settings(
+    CACHES={alias: {**config, 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+            for alias, config in settings.CACHES.items()},
+    SESSION_LRU_SIZE=5000,
+    AUTH_USER_CACHE_TIMEOUT=300,
+)
+
+
+def setUpModule():
+    _test_caches.enable()
+
+
+def tearDownModule():
+    _test_caches.disable()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class EmailBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'Alice@Example.com', 'pw')
+
+    def test_authenticates_by_normalized_email_in_one_query(self):
+        with self.assertNumQueries(1):
+            user = authenticate(email='  alice@EXAMPLE.com', password='pw')
+        self.assertEqual(user, self.user)
+
+    def test_rejects_wrong_password_unknown_email_and_inactive_user(self):
+        self.assertIsNone(authenticate(email='alice@example.com', password='wrong'))
+        self.assertIsNone(authenticate(email='bob@example.com', password='pw'))
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(authenticate(email='alice@example.com', password='pw'))
+
+    def test_email_key_follows_email_changes(self):
+        self.user.email = 'New@Example.com'
+        self.user.save(update_fields=['email'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email_key, 'new@example.com')
+
+    def test_duplicate_email_is_a_validation_error(self):
+        with self.assertRaises(ValidationError):
+            User.objects.create_user('alice2', 'ALICE@example.com', 'pw')
+        other = User(username='alice3', email='alice@example.COM', password='x')
+        with self.assertRaisesMessage(ValidationError, 'A user with that email already exists.'):
+            other.full_clean()
+        self.user.full_clean()
+
+
+@override_settings(
+    RATE_LIMIT_ENABLED=True, RATE_LIMIT_BACKEND='local', RATE_LIMIT_TRUSTED_PROXIES=['10.0.0.0/8'],
+    RATE_LIMITS={'resend_code': [('ip', 2, 60)], 'login': [('email', 1, 300)]},
+)
+class RateLimitTests(TestCase):
+    def setUp(self):
+        ratelimit._backends.clear()
+
+    def test_over_limit_gets_429_with_retry_after(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/auth/resend-code/').status_code, 200)
+        response = self.client.get('/auth/resend-code/')
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()['success'])
+        self.assertTrue(0 < int(response['Retry-After']) <= 60)
+
+    def test_clients_behind_trusted_proxy_are_counted_separately(self):
+        for client_ip in ('203.0.113.1', '203.0.113.2'):
+            for _ in range(2):
+                response = self.client.get(
+                    '/auth/resend-code/', REMOTE_ADDR='10.0.0.5', HTTP_X_FORWARDED_FOR=f'{client_ip}, 10.0.0.9'
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_forwarded_for_is_ignored_from_untrusted_peers(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='198.51.100.7', HTTP_X_FORWARDED_FOR='203.0.113.1')
+        self.assertEqual(ratelimit._client_ip(request), '198.51.100.7')
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.5', HTTP_X_FORWARDED_FOR='1.2.3.4, 203.0.113.1')
+        self.assertEqual(ratelimit._client_ip(request), '203.0.113.1')
+
+    def test_email_rule_is_case_insensitive(self):
+        factory = RequestFactory()
+        first = factory.post('/', {'username': 'Bob@example.com'})
+        second = factory.post('/', {'username': 'bob@EXAMPLE.com '})
+        for request in (first, second):
+            request.session = self.client.session
+        self.assertIsNone(ratelimit.check('login', first))
+        self.assertIsNotNone(ratelimit.check('login', second))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DatabaseCodeStoreTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.store = self.make_store()
+
+    def make_store(self):
+        return otp.DatabaseCodeStore()
+
+    def later(self, minutes):
+        return mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(minutes=minutes))
+
+    def test_code_is_consumed_on_first_use(self):
+        code = self.store.issue(self.user)
+        self.assertEqual(self.store.verify(self.user, code), otp.VALID)
+        self.assertEqual(self.store.verify(self.user, code), otp.INVALID)
+
+    def test_wrong_code_leaves_the_right_one_usable(self):
+        code = self.store.issue(self.user)
+        wrong = '000000' if code != '000000' else '111111'
+        self.assertEqual(self.store.verify(self.user, wrong), otp.INVALID)
+        self.assertEqual(self.store.verify(self.user, code), otp.VALID)
+
+    def test_new_code_replaces_the_previous_one(self):
+        first = self.store.issue(self.user)
+        second = self.store.issue(self.user)
+        if first != second:
+            self.assertEqual(self.store.verify(self.user, first), otp.INVALID)
+        self.assertEqual(self.store.verify(self.user, second), otp.VALID)
+
+    def test_expired_code_is_refused(self):
+        code = self.store.issue(self.user)
+        with self.later(settings.TWO_FACTOR_CODE_TTL_MINUTES + 1):
+            self.assertEqual(self.store.verify(self.user, code), otp.EXPIRED)
+
+    def test_purge_removes_expired_codes(self):
+        self.store.issue(self.user)
+        other = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        self.store.issue(other)
+        self.assertEqual(self.store.purge_expired(), 0)
+        with self.later(settings.TWO_FACTOR_CODE_TTL_MINUTES + 1):
+            self.assertEqual(self.store.purge_expired(batch_size=1), 2)
+        self.assertFalse(TwoFactorCode.objects.exists())
+
+
+class CacheCodeStoreTests(DatabaseCodeStoreTests):
+    def make_store(self):
+        caches['default'].clear()
+        return otp.CacheCodeStore('default')
+
+    def test_purge_removes_expired_codes(self):
+        # Expiry is left to the cache.
+        self.store.issue(self.user)
+        self.assertEqual(self.store.purge_expired(), 0)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    ACCOUNT_PROVISIONING='activation',
+)
+class ActivationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@example.com', provisioning.initial_password())
+
+    def activate(self, path, password):
+        return self.client.post(path, {'new_password1': password, 'new_password2': password})
+
+    def test_new_account_has_no_usable_password_until_activated(self):
+        self.assertFalse(self.user.has_usable_password())
+        path = provisioning.credentials(self.user, None)['activation_path']
+
+        response = self.activate(path, 'A-long-first-password-1')
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('A-long-first-password-1'))
+
+    def test_link_works_only_once(self):
+        path = provisioning.activation_path(self.user)
+        self.activate(path, 'A-long-first-password-1')
+        self.assertIsNone(provisioning.user_for_activation(*path.strip('/').split('/')[-2:]))
+
+        self.activate(path, 'Another-long-password-2')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('A-long-first-password-1'))
+
+    def test_tampered_link_is_refused(self):
+        uidb64, token = provisioning.activation_path(self.user).strip('/').split('/')[-2:]
+        self.assertEqual(provisioning.user_for_activation(uidb64, token), self.user)
+        self.assertIsNone(provisioning.user_for_activation(uidb64, token[:-1] + 'x'))
+        self.assertIsNone(provisioning.user_for_activation('bm9wZQ', token))
+
+    @override_settings(ACCOUNT_PROVISIONING='password', PASSWORD_HASH_WORKERS=0)
+    def test_password_mode_hands_out_temporary_passwords(self):
+        accounts = provisioning.initial_passwords(3)
+        self.assertEqual(len({plain for plain, _encoded in accounts}), 3)
+        for plain, encoded in accounts:
+            self.assertTrue(check_password(plain, encoded))
+        self.assertEqual(provisioning.credentials(self.user, 'secret'), {'temporary_password': 'secret'})
+
+
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        session = SessionStore()
+        session['step'] = 1
+        session.create()
+        self.key = session.session_key
+
+    def other_worker(self):
+        # A worker process with its own (empty) LRU and the shared stamps.
+        return mock.patch.object(session_store, '_sessions', session_store._LRU())
+
+    def test_repeated_loads_are_served_from_the_lru(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(self.key).load(), {'step': 1})
+
+    def test_change_on_another_worker_is_picked_up(self):
+        SessionStore(self.key).load()
+        with self.other_worker():
+            session = SessionStore(self.key)
+            session['step'] = 2
+            session.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(SessionStore(self.key).load(), {'step': 2})
+
+    def test_logout_on_another_worker_ends_the_session_here(self):
+        SessionStore(self.key).load()
+        with self.other_worker():
+            session = SessionStore(self.key)
+            session.load()
+            session.flush()
+        session = SessionStore(self.key)
+        self.assertEqual(session.load(), {})
+        self.assertIsNone(session.session_key)
+
+    def test_unchanged_save_skips_the_write(self):
+        session = SessionStore(self.key)
+        session.load()
+        with self.assertNumQueries(0):
+            session.save()
+
+        with mock.patch.object(session_store, 'TOUCH_INTERVAL', timedelta(0)):
+            with CaptureQueriesContext(connection) as queries:
+                session.save()
+        self.assertTrue(queries)
+
+        session['step'] = 3
+        session.save()
+        self.assertEqual(Session.objects.get(pk=self.key).get_decoded(), {'step': 3})
+
+    @override_settings(SESSION_LRU_SIZE=0)
+    def test_without_the_lru_every_load_reads_the_row(self):
+        session = SessionStore(self.key)
+        with self.assertNumQueries(1):
+            self.assertEqual(session.load(), {'step': 1})
+        with mock.patch.object(session_store, '_bump_version') as bump:
+            session['step'] = 2
+            session.save()
+        bump.assert_not_called()
+        with self.assertNumQueries(1):
+            self.assertEqual(SessionStore(self.key).load(), {'step': 2})
+
+    def test_clear_expired_deletes_in_batches(self):
+        past = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            Session(session_key=f'expired{i}', session_data='', expire_date=past) for i in range(5)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            SessionStore.clear_expired(batch_size=2)
+        self.assertEqual(list(Session.objects.values_list('pk', flat=True)), [self.key])
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 3)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CachedUserTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('carol', 'carol@example.com', 'pw', user_type='admin')
+        self.client.force_login(self.user)
+
+    def current_user(self):
+        request = RequestFactory().get('/')
+        request.session = SessionStore(self.client.session.session_key)
+        return get_cached_user(request)
+
+    def change(self, **fields):
+        user = User.objects.get(pk=self.user.pk)
+        for name, value in fields.items():
+            setattr(user, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        return user
+
+    def test_user_is_served_from_the_cache(self):
+        self.current_user()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.current_user(), self.user)
+
+    def test_toggle_2fa_takes_effect_on_the_next_request(self):
+        self.assertFalse(self.current_user().two_factor_enabled)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('toggle_2fa'))
+        self.assertTrue(response.json()['enabled'])
+        self.assertTrue(self.current_user().two_factor_enabled)
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.assertTrue(self.current_user().is_authenticated)
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertFalse(self.current_user().is_authenticated)
+
+    def test_deactivation_and_demotion_take_effect(self):
+        self.current_user()
+        self.change(user_type='employee')
+        self.assertEqual(self.current_user().user_type, 'employee')
+        self.change(is_active=False)
+        self.assertFalse(self.current_user().is_authenticated)
+
+    def test_row_loaded_before_a_change_commits_is_not_served(self):
+        stale = User.objects.get(pk=self.user.pk)
+
+        def load_then_commit(request):
+            # The admin's change commits while this request holds the old row.
+            User.objects.filter(pk=self.user.pk).update(user_type='employee')
+            invalidate_cached_users([self.user.pk])
+            return stale
+
+        with mock.patch('authentication.middleware.auth.get_user', side_effect=load_then_commit):
+            self.assertEqual(self.current_user().user_type, 'admin')
+        self.assertEqual(self.current_user().user_type, 'employee')
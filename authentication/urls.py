@@ -9,6 +9,7 @@ urlpatterns = [
     path('two-factor/', views.two_factor_view, name='two_factor'),
     path('resend-code/', views.resend_code_view, name='resend_code'),
     path('forgot-password/', views.forgot_password_view, name='forgot_password'),
+    path('activate/<uidb64>/<token>/', views.activate_account_view, name='activate_account'),
     path('profile/', views.profile_view, name='profile'),
     path('toggle-2fa/', views.toggle_2fa_view, name='toggle_2fa'),
 ]
\ No newline at end of file
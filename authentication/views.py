@@ -1,22 +1,21 @@
-import random
-import string
-from datetime import timedelta
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
+from django.contrib.auth.forms import SetPasswordForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib import messages
-from django.utils import timezone
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST ,require_GET
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, TwoFactorForm, ForgotPasswordForm
-from .models import TwoFactorCode, User
-
-def generate_verification_code():
-    return ''.join(random.choices(string.digits, k=6))
+from .models import User, normalize_email_key
+from .otp import EXPIRED, VALID, get_code_store
+from .provisioning import user_for_activation
+from .ratelimit import rate_limit
 
+@method_decorator(rate_limit('login'), name='dispatch')
 class CustomLoginView(LoginView):
     form_class = CustomAuthenticationForm
     template_name = 'authentication/login.html'
@@ -26,15 +25,8 @@ class CustomLoginView(LoginView):
         # Check if user has 2FA enabled
         user = form.get_user()
         if user.two_factor_enabled:
-            # Generate and save 2FA code
-            code = generate_verification_code()
-            expires_at = timezone.now() + timedelta(minutes=10)
-            
-            TwoFactorCode.objects.create(
-                user=user,
-                code=code,
-                expires_at=expires_at
-            )
+            # Generate and store 2FA code (replaces any earlier one)
+            code = get_code_store().issue(user)
             
             # Store user ID in session for 2FA verification
             self.request.session['2fa_user_id'] = user.id
@@ -60,6 +52,7 @@ def signup_view(request):
     
     return render(request, 'authentication/signup.html', {'form': form})
 
+@rate_limit('two_factor')
 def two_factor_view(request):
     user_id = request.session.get('2fa_user_id')
     if not user_id:
@@ -72,32 +65,22 @@ def two_factor_view(request):
         if form.is_valid():
             code = form.cleaned_data['code']
             
-            # Check if code is valid
-            try:
-                two_factor_code = TwoFactorCode.objects.get(
-                    user=user,
-                    code=code,
-                    is_used=False
-                )
+            # Check (and consume) the code
+            result = get_code_store().verify(user, code)
+            if result == VALID:
+                # Log in the user (the password was checked by the email backend)
+                login(request, user, backend='authentication.backends.EmailBackend')
+                
+                # Clear 2FA session data
+                del request.session['2fa_user_id']
+                if '2fa_method' in request.session:
+                    del request.session['2fa_method']
                 
-                if two_factor_code.is_valid:
-                    # Mark code as used
-                    two_factor_code.is_used = True
-                    two_factor_code.save()
-                    
-                    # Log in the user
-                    login(request, user)
-                    
-                    # Clear 2FA session data
-                    del request.session['2fa_user_id']
-                    if '2fa_method' in request.session:
-                        del request.session['2fa_method']
-                    
-                    messages.success(request, 'Login successful!')
-                    return redirect('dashboard')
-                else:
-                    messages.error(request, 'Verification code has expired. Please request a new one.')
-            except TwoFactorCode.DoesNotExist:
+                messages.success(request, 'Login successful!')
+                return redirect('dashboard')
+            elif result == EXPIRED:
+                messages.error(request, 'Verification code has expired. Please request a new one.')
+            else:
                 messages.error(request, 'Invalid verification code. Please try again.')
     else:
         form = TwoFactorForm()
@@ -108,6 +91,7 @@ def two_factor_view(request):
         'method': request.session.get('2fa_method', 'email')
     })
 
+@rate_limit('resend_code', methods=('GET', 'POST'), json=True)
 def resend_code_view(request):
     user_id = request.session.get('2fa_user_id')
     if not user_id:
@@ -115,15 +99,8 @@ def resend_code_view(request):
     
     user = User.objects.get(id=user_id)
     
-    # Generate new code
-    code = generate_verification_code()
-    expires_at = timezone.now() + timedelta(minutes=10)
-    
-    TwoFactorCode.objects.create(
-        user=user,
-        code=code,
-        expires_at=expires_at
-    )
+    # Generate new code (the previous one stops working)
+    code = get_code_store().issue(user)
     
     # In a real app, send the code via email/SMS/authenticator
     print(f"New 2FA code for {user.email}: {code}")
@@ -135,7 +112,7 @@ def forgot_password_view(request):
         form = ForgotPasswordForm(request.POST)
         if form.is_valid():
             email = form.cleaned_data['email']
-            user = User.objects.get(email=email)
+            user = User.objects.get(email_key=normalize_email_key(email))
             
             # In a real app, send password reset email
             print(f"Password reset link sent to {email}")
@@ -147,6 +124,24 @@ def forgot_password_view(request):
     
     return render(request, 'authentication/forgot_password.html', {'form': form})
 
+def activate_account_view(request, uidb64, token):
+    # One-time link from provisioning: the new account holder sets a first password
+    user = user_for_activation(uidb64, token)
+    if user is None:
+        messages.error(request, 'This activation link is invalid or has already been used.')
+        return redirect('login')
+
+    if request.method == 'POST':
+        form = SetPasswordForm(user, request.POST)
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Your account is active. Please log in.')
+            return redirect('login')
+    else:
+        form = SetPasswordForm(user)
+
+    return render(request, 'authentication/activate_account.html', {'form': form})
+
 @login_required
 def profile_view(request):
     return render(request, 'authentication/profile.html', {'user': request.user})
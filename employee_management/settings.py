@@ -1,5 +1,6 @@
 import os 
-from decouple import config
+from decouple import Csv, config
+from django.core.exceptions import ImproperlyConfigured
 from manage import BASE_DIR
 from pathlib import Path
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -27,7 +28,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'authentication.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ] 
@@ -98,6 +99,128 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Files that must not be reachable under MEDIA_URL (export reports). Keep it
+# outside MEDIA_ROOT and out of the web server's document roots; they are
+# served only by views that check permissions.
+PRIVATE_MEDIA_ROOT = config('PRIVATE_MEDIA_ROOT', default=os.path.join(BASE_DIR, 'private_media'))
+
+# Export jobs (PDF / Word reports rendered by `manage.py run_export_worker`)
+EXPORT_JOB_STALE_MINUTES = config('EXPORT_JOB_STALE_MINUTES', default=30, cast=int)
+
+# Media backups (content-addressed store under backups/media_store, see
+# `manage.py snapshot_media`): number of snapshots kept by retention pruning.
+# Snapshots still referenced by a retained database backup are kept as well.
+MEDIA_BACKUP_KEEP = config('MEDIA_BACKUP_KEEP', default=14, cast=int)
+# Database backups under backups/: each full backup taken deletes all but the
+# newest BACKUP_KEEP_CHAINS chains (a full backup and its incrementals).
+BACKUP_KEEP_CHAINS = config('BACKUP_KEEP_CHAINS', default=14, cast=int)
+
+# Profile picture thumbnails are rendered by this many worker processes after
+# an upload is saved (0 renders them inline, in the request).
+THUMBNAIL_WORKERS = config('THUMBNAIL_WORKERS', default=2, cast=int)
+
+# On-demand photo resizes (/employees/photo/<pk>/<w>x<h>/) are cached on disk
+# and evicted least-recently-used first beyond PHOTO_CACHE_MAX_BYTES.
+PHOTO_CACHE_DIR = config('PHOTO_CACHE_DIR', default=os.path.join(BASE_DIR, 'cache', 'photos'))
+PHOTO_CACHE_MAX_BYTES = config('PHOTO_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+PHOTO_CACHE_MAX_AGE = config('PHOTO_CACHE_MAX_AGE', default=3600, cast=int)
+
+# New employee accounts (add employee, bulk import)
+# ACCOUNT_PROVISIONING: 'activation' creates them without a usable password
+# and hands out a one-time activation link (no hashing at creation time);
+# 'password' gives each a random temporary password. Bulk imports hash those
+# in PASSWORD_HASH_WORKERS processes (0 hashes inline).
+ACCOUNT_PROVISIONING = config('ACCOUNT_PROVISIONING', default='activation')
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=4, cast=int)
+
+# Login / two-factor rate limits (see authentication/ratelimit.py)
+# RATE_LIMIT_BACKEND: 'local' counts in each worker process without locking,
+# 'cache' counts in RATE_LIMIT_CACHE_ALIAS (shared when that cache is).
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMIT_BACKEND = config('RATE_LIMIT_BACKEND', default='local')
+RATE_LIMIT_CACHE_ALIAS = config('RATE_LIMIT_CACHE_ALIAS', default='default')
+# Scope -> [(key, limit, window seconds)]; key is 'ip', 'email' or 'session'.
+# A request is refused as soon as one rule is over its limit.
+RATE_LIMITS = {
+    'login': [('ip', 30, 60), ('email', 10, 300)],
+    'two_factor': [('ip', 30, 60), ('session', 5, 300)],
+    'resend_code': [('ip', 10, 60), ('session', 3, 300)],
+}
+# Addresses or networks of reverse proxies (e.g. the Nginx in front of
+# Gunicorn) whose X-Forwarded-For is trusted to name the client. Without
+# them every request behind the proxy shares the proxy's address.
+RATE_LIMIT_TRUSTED_PROXIES = config('RATE_LIMIT_TRUSTED_PROXIES', default='', cast=Csv())
+
+# Shared cache ('sessions' alias) for session version stamps and cached
+# request.user entries: memcached or redis, e.g. redis://127.0.0.1:6379/1 or
+# memcached://127.0.0.1:11211. Every worker must see the same one and writes
+# must be cheap (each session save writes a stamp); the file cache does not
+# qualify, as every set() lists its whole directory to cull it. Without a
+# shared cache both tiers below are off.
+SHARED_CACHE_URL = config('SHARED_CACHE_URL', default='')
+
+# Sessions
+# Rows in the database (the source of truth) with a per-worker LRU of up to
+# SESSION_LRU_SIZE sessions in front (0, the default without SHARED_CACHE_URL,
+# disables it). Copies are checked against version stamps in
+# SESSION_VERSION_CACHE_ALIAS.
+# `manage.py clearsessions` removes expired rows in batches.
+SESSION_ENGINE = 'authentication.session_store'
+SESSION_LRU_SIZE = config('SESSION_LRU_SIZE', default=5000 if SHARED_CACHE_URL else 0, cast=int)
+SESSION_VERSION_CACHE_ALIAS = config('SESSION_VERSION_CACHE_ALIAS', default='sessions')
+
+# request.user is resolved from AUTH_USER_CACHE_ALIAS (keyed by user id,
+# checked against the session auth hash) instead of a query per request.
+# Entries are dropped when the User is saved or deleted, so the cache must be
+# the shared one. AUTH_USER_CACHE_TIMEOUT = 0 disables it.
+AUTH_USER_CACHE_ALIAS = config('AUTH_USER_CACHE_ALIAS', default='sessions')
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=300 if SHARED_CACHE_URL else 0, cast=int)
+if (SESSION_LRU_SIZE > 0 or AUTH_USER_CACHE_TIMEOUT > 0) and not SHARED_CACHE_URL:
+    raise ImproperlyConfigured("SESSION_LRU_SIZE and AUTH_USER_CACHE_TIMEOUT need SHARED_CACHE_URL.")
+
+# Two-factor codes
+# TWO_FACTOR_STORE: 'db' keeps codes in the TwoFactorCode table (sweep with
+# `manage.py purge_2fa_codes`), 'cache' keeps them in TWO_FACTOR_CACHE_ALIAS
+# with native expiry (use a shared cache when running several workers).
+TWO_FACTOR_STORE = config('TWO_FACTOR_STORE', default='db')
+TWO_FACTOR_CACHE_ALIAS = config('TWO_FACTOR_CACHE_ALIAS', default='default')
+TWO_FACTOR_CODE_TTL_MINUTES = config('TWO_FACTOR_CODE_TTL_MINUTES', default=10, cast=int)
+
+# Caches
+# Dashboard statistics are cached per scope (admin-wide / per employee) and
+# invalidated by signals whenever an Employee or User changes.
+# DASHBOARD_CACHE_BACKEND: 'file' (the default) shares them between all
+# workers on the host, so an invalidation in one worker reaches the others.
+# 'locmem' keeps them in each worker process and is only safe with a single
+# worker: elsewhere other workers serve stale figures for up to
+# DASHBOARD_CACHE_TIMEOUT seconds.
+DASHBOARD_CACHE_BACKEND = config('DASHBOARD_CACHE_BACKEND', default='file')
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache' if DASHBOARD_CACHE_BACKEND == 'file'
+                   else 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'dashboard') if DASHBOARD_CACHE_BACKEND == 'file' else 'dashboard',
+        'TIMEOUT': DASHBOARD_CACHE_TIMEOUT,
+    },
+}
+# Session version stamps and request.user entries (see SHARED_CACHE_URL)
+if SHARED_CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES['sessions'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': SHARED_CACHE_URL}
+elif SHARED_CACHE_URL.startswith('memcached://'):
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': SHARED_CACHE_URL[len('memcached://'):],
+    }
+elif SHARED_CACHE_URL:
+    raise ImproperlyConfigured("SHARED_CACHE_URL must be a redis:// or memcached:// URL.")
+else:
+    # Unused: the session LRU and the request.user cache are off.
+    CACHES['sessions'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sessions'}
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -105,6 +228,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom user model
 AUTH_USER_MODEL = 'authentication.User'
 
+# The login form signs in by email (one indexed lookup on User.email_key);
+# ModelBackend keeps username authentication for the admin site.
+AUTHENTICATION_BACKENDS = [
+    'authentication.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # Login URLs
 # Authentication redirects
 LOGIN_URL = '/auth/login/'
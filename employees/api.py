@@ -0,0 +1,66 @@
+import hashlib
+
+from django.db.models import Count, Max
+
+# Public field name -> ORM path. Only the requested paths are selected.
+API_FIELDS = {
+    'id': 'id',
+    'first_name': 'user__first_name',
+    'last_name': 'user__last_name',
+    'email': 'user__email',
+    'department': 'department',
+    'position': 'position',
+    'phone': 'phone',
+    'address': 'address',
+    'join_date': 'join_date',
+    'status': 'status',
+    'updated_at': 'updated_at',
+}
+API_DEFAULT_LIMIT = 25
+API_MAX_LIMIT = 100
+
+
+def parse_fields(value):
+    """
+    Public field names from a comma separated ?fields= value (all fields when
+    empty). Raises ValueError naming any unknown field.
+    """
+    fields = [name.strip() for name in (value or '').split(',') if name.strip()]
+    if not fields:
+        return list(API_FIELDS)
+    unknown = [name for name in fields if name not in API_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return list(dict.fromkeys(fields))
+
+
+def parse_limit(value):
+    try:
+        limit = int(value) if value else API_DEFAULT_LIMIT
+    except ValueError:
+        raise ValueError("Invalid limit")
+    if limit < 1:
+        raise ValueError("Invalid limit")
+    return min(limit, API_MAX_LIMIT)
+
+
+def list_validators(employees, params):
+    """
+    (row count, ETag) for a filtered queryset in a single aggregate query.
+    Any insert, delete or edit of a matching row changes max(updated_at) or
+    the count; the query string is hashed in so every page/projection gets
+    its own tag. There is deliberately no Last-Modified: max(updated_at)
+    does not move when a row is deleted or leaves the filter.
+    """
+    summary = employees.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    last_modified = summary['last_modified']
+    digest = hashlib.sha256()
+    digest.update(f"{last_modified.isoformat() if last_modified else '-'}:{summary['count']}".encode())
+    for key, values in sorted(params.lists()):
+        digest.update(f"|{key}={','.join(values)}".encode())
+    return summary['count'], f'"{digest.hexdigest()[:32]}"'
+
+
+def project(row, fields):
+    """A values() row keyed by public field names."""
+    return {name: row[API_FIELDS[name]] for name in fields}
@@ -0,0 +1,362 @@
+import json
+import os
+import time
+import zipfile
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .counters import rebuild_counters
+from .media_store import load_snapshot, open_blob, prune_snapshots, snapshot_media
+from .models import DeletedRecord
+
+BACKUP_DIR = os.path.join(settings.BASE_DIR, 'backups')
+MANIFEST_SUFFIX = '.manifest.json'
+FULL_BACKUP_EXCLUDE = ['sessions', 'employees.DeletedRecord']
+# Models carried by incremental backups, in dependency order. They are the
+# ones with an updated_at column and a DeletedRecord tombstone on delete; the
+# rest of a full backup is derived (counters) or short-lived (2FA codes,
+# export jobs).
+INCREMENTAL_MODELS = [settings.AUTH_USER_MODEL, 'employees.Employee']
+# Each delta starts this long before the previous backup, so rows written by
+# transactions still open at that moment are not missed. Replaying a row twice
+# is harmless.
+INCREMENTAL_OVERLAP = timedelta(minutes=5)
+SERIALIZE_CHUNK_SIZE = 2000
+MEDIA_BLOCK_SIZE = 64 * 1024
+# Already-compressed formats are stored as-is in archives; deflating them
+# costs CPU for no gain.
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.zip', '.gz', '.docx'}
+
+
+class BackupChainError(Exception):
+    pass
+
+
+# ------------------------------
+# Manifests
+# ------------------------------
+# Every backup file gets a sidecar "<name>.manifest.json" describing it:
+# {"file", "kind": "full"|"incremental", "taken_at", "since", "parent"},
+# plus "media_snapshot" (employees.media_store) for full backups.
+# A chain is a full backup followed by the incrementals whose parent links
+# lead back to it.
+def load_manifests():
+    """All backup manifests, oldest first."""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    manifests = []
+    for name in os.listdir(BACKUP_DIR):
+        if name.endswith(MANIFEST_SUFFIX):
+            with open(os.path.join(BACKUP_DIR, name), encoding='utf-8') as f:
+                manifests.append(json.load(f))
+    return sorted(manifests, key=lambda manifest: manifest['taken_at'])
+
+
+def _manifest_path(manifest):
+    return os.path.join(BACKUP_DIR, manifest['file'][:-len('.json')] + MANIFEST_SUFFIX)
+
+
+def prune_backups(keep_chains):
+    """
+    Delete every backup (file and manifest) older than the newest
+    `keep_chains` full backups. Returns the number of backups removed.
+    """
+    manifests = load_manifests()
+    fulls = [i for i, manifest in enumerate(manifests) if manifest['kind'] == 'full']
+    if keep_chains <= 0 or len(fulls) <= keep_chains:
+        return 0
+    doomed = manifests[:fulls[-keep_chains]]
+    for manifest in doomed:
+        # The manifest goes first: a backup without one is never part of a chain.
+        for path in (_manifest_path(manifest), os.path.join(BACKUP_DIR, manifest['file'])):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return len(doomed)
+
+
+def prune_media_snapshots(keep):
+    """media_store.prune_snapshots(), sparing every snapshot a retained backup manifest references."""
+    pinned = {manifest['media_snapshot'] for manifest in load_manifests() if manifest.get('media_snapshot')}
+    return prune_snapshots(keep, pinned)
+
+
+def _write_manifest(manifest):
+    path = _manifest_path(manifest)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, cls=DjangoJSONEncoder)
+    os.replace(path + '.tmp', path)
+
+
+def _backup_filename(taken_at, suffix=''):
+    return f"backup_{timezone.localtime(taken_at):%Y%m%d_%H%M%S}{suffix}.json"
+
+
+# ------------------------------
+# Serialization
+# ------------------------------
+def dump_models(exclude=FULL_BACKUP_EXCLUDE):
+    """The models `dumpdata --exclude ...` would write, in dependency order."""
+    excluded = {label.lower() for label in exclude}
+    app_list = {}
+    for app_config in apps.get_app_configs():
+        if app_config.label in excluded or app_config.models_module is None:
+            continue
+        models = [
+            model for model in app_config.get_models()
+            if not model._meta.proxy and model._meta.label_lower not in excluded
+        ]
+        if models:
+            app_list[app_config] = models
+    return serializers.sort_dependencies(app_list.items(), allow_cycles=True)
+
+
+def iter_model_chunks(model, chunk_size=SERIALIZE_CHUNK_SIZE):
+    """Every row of `model` as lists of up to chunk_size instances, by primary key range."""
+    queryset = model._default_manager.order_by('pk')
+    m2m = [field.name for field in model._meta.many_to_many]
+    if m2m:
+        # The serializer reuses prefetched relations instead of a query per row.
+        queryset = queryset.prefetch_related(*m2m)
+    last_pk = None
+    while True:
+        chunk = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+# ------------------------------
+# Taking backups
+# ------------------------------
+def write_full_backup():
+    """
+    Dump every app (as create_backup always has), snapshot media and start a
+    new chain. Returns the file path.
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    taken_at = timezone.now()
+    filename = _backup_filename(taken_at)
+    path = os.path.join(BACKUP_DIR, filename)
+
+    exclude = []
+    for label in FULL_BACKUP_EXCLUDE:
+        exclude += ['--exclude', label]
+    with open(path, 'w', encoding='utf-8') as f:
+        call_command('dumpdata', *exclude, '--indent', '2', stdout=f)
+
+    # Media goes to the deduplicated store: only files not seen before are copied.
+    media_snapshot, _stats = snapshot_media()
+    _write_manifest({
+        'file': filename, 'kind': 'full', 'taken_at': taken_at, 'since': None, 'parent': None,
+        'media_snapshot': media_snapshot,
+    })
+    # After the manifest, which pins the new snapshot. Retiring old chains
+    # first releases the snapshots only they referenced.
+    prune_backups(settings.BACKUP_KEEP_CHAINS)
+    prune_media_snapshots(settings.MEDIA_BACKUP_KEEP)
+    # Deletions before this point are captured by the snapshot itself.
+    DeletedRecord.objects.filter(deleted_at__lt=taken_at - INCREMENTAL_OVERLAP).delete()
+    return path
+
+
+def write_incremental_backup():
+    """
+    Write the rows changed (and tombstones recorded) since the last backup.
+    Falls back to a full backup when there is no chain to extend. Returns
+    (file path, kind).
+    """
+    manifests = load_manifests()
+    if not any(manifest['kind'] == 'full' for manifest in manifests):
+        return write_full_backup(), 'full'
+
+    parent = manifests[-1]
+    since = parse_datetime(parent['taken_at']) - INCREMENTAL_OVERLAP
+    taken_at = timezone.now()
+    filename = _backup_filename(taken_at, '_incremental')
+    path = os.path.join(BACKUP_DIR, filename)
+
+    # One transaction, so on MySQL/SQLite rows and tombstones come from the
+    # same snapshot.
+    with transaction.atomic():
+        objects = []
+        for label in INCREMENTAL_MODELS:
+            changed = apps.get_model(label)._default_manager.filter(updated_at__gte=since).order_by('pk')
+            objects += serializers.serialize('python', changed.iterator(chunk_size=SERIALIZE_CHUNK_SIZE))
+        deleted = list(
+            DeletedRecord.objects.filter(deleted_at__gte=since)
+            .order_by('deleted_at', 'id')
+            .values('model', 'object_pk', 'deleted_at')
+        )
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {'kind': 'incremental', 'since': since, 'taken_at': taken_at, 'objects': objects, 'deleted': deleted},
+            f, indent=2, cls=DjangoJSONEncoder,
+        )
+    _write_manifest({
+        'file': filename, 'kind': 'incremental', 'taken_at': taken_at,
+        'since': since, 'parent': parent['file'],
+    })
+    return path, 'incremental'
+
+
+# ------------------------------
+# Streamed full backup archive
+# ------------------------------
+class _StreamBuffer:
+    """Write-only, unseekable file that ZipFile writes into and the response drains."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _media_info(relpath, entry):
+    mtime = time.localtime(entry['mtime_ns'] / 1e9)[:6]
+    info = zipfile.ZipInfo('media/' + relpath, date_time=max(mtime, (1980, 1, 1, 0, 0, 0)))
+    info.file_size = entry['size']
+    info.external_attr = 0o644 << 16
+    extension = os.path.splitext(relpath)[1].lower()
+    info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    return info
+
+
+def stream_full_backup(chunk_size=SERIALIZE_CHUNK_SIZE, since=None):
+    """
+    Snapshot media into the deduplicated store (only new contents are
+    copied), then return an iterator over a ZIP of db_backup.json (loaddata
+    format), media_snapshot.json and the media tree, produced a database
+    chunk or media block at a time, so neither a staging copy nor the whole
+    archive is ever held on disk or in memory.
+
+    media_snapshot.json lists every media file with its hash. With `since`
+    (the snapshot name recorded in an earlier archive), media/ only holds the
+    files added or changed after it: that archive plus this one restore the
+    tree. Raises MediaStoreError for an unknown (e.g. pruned) `since`.
+    """
+    base = load_snapshot(since)['files'] if since else {}
+    name, _stats = snapshot_media()
+    prune_media_snapshots(settings.MEDIA_BACKUP_KEEP)
+    files = load_snapshot(name)['files']
+    changed = {
+        relpath: entry for relpath, entry in files.items()
+        if base.get(relpath, {}).get('sha256') != entry['sha256']
+    }
+    listing = {
+        'name': name, 'since': since,
+        'files': {relpath: {'sha256': entry['sha256'], 'size': entry['size']} for relpath, entry in files.items()},
+    }
+    return _stream_archive(listing, changed, chunk_size)
+
+
+def _stream_archive(listing, media, chunk_size):
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open('db_backup.json', 'w', force_zip64=True) as entry:
+            separator = b'[\n'
+            for model in dump_models():
+                for chunk in iter_model_chunks(model, chunk_size):
+                    for obj in serializers.serialize('python', chunk):
+                        entry.write(separator + json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False).encode())
+                        separator = b',\n'
+                    yield buffer.drain()
+            entry.write(b'[]\n' if separator == b'[\n' else b'\n]\n')
+
+        archive.writestr('media_snapshot.json', json.dumps(listing, indent=2, sort_keys=True))
+        for relpath in sorted(media):
+            with open_blob(media[relpath]['sha256']) as src, archive.open(_media_info(relpath, media[relpath]), 'w') as dest:
+                while block := src.read(MEDIA_BLOCK_SIZE):
+                    dest.write(block)
+                    yield buffer.drain()
+    # Central directory
+    yield buffer.drain()
+
+
+# ------------------------------
+# Restoring
+# ------------------------------
+def backup_chain(until=None):
+    """
+    Manifests of the full backup and deltas needed to restore the state as
+    of backup file `until` (default: the latest backup).
+    """
+    manifests = load_manifests()
+    if until is not None:
+        names = [manifest['file'] for manifest in manifests]
+        if until not in names:
+            raise BackupChainError(f"No backup named '{until}'.")
+        manifests = manifests[:names.index(until) + 1]
+
+    fulls = [i for i, manifest in enumerate(manifests) if manifest['kind'] == 'full']
+    if not fulls:
+        raise BackupChainError("No full backup to start the chain from.")
+    chain = manifests[fulls[-1]:]
+    for previous, manifest in zip(chain, chain[1:]):
+        if manifest['parent'] != previous['file']:
+            raise BackupChainError(
+                f"Broken chain: {manifest['file']} follows {manifest['parent']}, not {previous['file']}."
+            )
+    for manifest in chain:
+        if not os.path.exists(os.path.join(BACKUP_DIR, manifest['file'])):
+            raise BackupChainError(f"Backup file {manifest['file']} is missing.")
+    return chain
+
+
+def apply_delta(path):
+    """Replay one incremental backup: tombstones first, then changed rows."""
+    with open(path, encoding='utf-8') as f:
+        delta = json.load(f)
+
+    deleted = {}
+    for record in delta['deleted']:
+        deleted.setdefault(record['model'], []).append(record['object_pk'])
+    for label, pks in deleted.items():
+        # ORM delete, so SET_NULL/CASCADE behave as they did originally.
+        apps.get_model(label)._default_manager.filter(pk__in=pks).delete()
+
+    for obj in serializers.deserialize('python', delta['objects']):
+        obj.save()
+    return len(delta['objects']), len(delta['deleted'])
+
+
+def restore_chain(chain, stdout=None):
+    """
+    Load the chain's full backup and replay its deltas in order, in one
+    transaction. Expects a database without users or employees.
+    """
+    with transaction.atomic():
+        # The full backup carries its own content types (and permissions).
+        ContentType.objects.all().delete()
+        ContentType.objects.clear_cache()
+        call_command('loaddata', os.path.join(BACKUP_DIR, chain[0]['file']), verbosity=0)
+        if stdout:
+            stdout.write(f"Loaded {chain[0]['file']}")
+        for manifest in chain[1:]:
+            changed, deleted = apply_delta(os.path.join(BACKUP_DIR, manifest['file']))
+            if stdout:
+                stdout.write(f"Applied {manifest['file']}: {changed} rows, {deleted} deletions")
+        # Fixtures are saved raw, which the counter signals ignore.
+        rebuild_counters()
@@ -0,0 +1,131 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import Employee, HeadcountCounter
+
+
+def _to_date(value):
+    # join_date defaults to timezone.now, so unsaved instances may hold a datetime.
+    return Employee._meta.get_field('join_date').to_python(value)
+
+
+def bucket(department, status, join_date, user_active):
+    """The HeadcountCounter key an employee with these values is counted in."""
+    return (department, status, _to_date(join_date).replace(day=1), bool(user_active))
+
+
+def stored_bucket(employee_id):
+    """Bucket of the employee as currently stored in the database, or None."""
+    row = (
+        Employee.objects.filter(pk=employee_id)
+        .values_list('department', 'status', 'join_date', 'user__is_active')
+        .first()
+    )
+    return bucket(*row) if row else None
+
+
+def instance_bucket(employee):
+    user_active = employee.user.is_active if employee.user_id else False
+    return bucket(employee.department, employee.status, employee.join_date, user_active)
+
+
+def apply_deltas(deltas):
+    """Add each delta of a {bucket: delta} mapping to its counter row."""
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        department, status, join_month, user_active = key
+        counter = HeadcountCounter.objects.filter(
+            department=department, status=status, join_month=join_month, user_active=user_active
+        )
+        if counter.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                HeadcountCounter.objects.create(
+                    department=department, status=status, join_month=join_month,
+                    user_active=user_active, count=delta,
+                )
+        except IntegrityError:
+            # Another writer created the row first.
+            counter.update(count=F('count') + delta)
+
+
+def move(old_bucket, new_bucket):
+    deltas = Counter()
+    if old_bucket is not None:
+        deltas[old_bucket] -= 1
+    if new_bucket is not None:
+        deltas[new_bucket] += 1
+    apply_deltas(deltas)
+
+
+def expected_counts():
+    """Counts recomputed from the employee table, as {bucket: count}."""
+    rows = (
+        Employee.objects.order_by()
+        .annotate(month=TruncMonth('join_date'), active=Coalesce('user__is_active', Value(False)))
+        .values('department', 'status', 'month', 'active')
+        .annotate(total=Count('id'))
+    )
+    return {
+        (row['department'], row['status'], row['month'], row['active']): row['total']
+        for row in rows
+    }
+
+
+def rebuild_counters():
+    """Bring the counters table back in line with the employee table; returns the buckets that drifted."""
+    with transaction.atomic():
+        expected = expected_counts()
+        current = {
+            (c.department, c.status, c.join_month, c.user_active): c.count
+            for c in HeadcountCounter.objects.select_for_update()
+        }
+        drift = {
+            key: (current.get(key, 0), expected.get(key, 0))
+            for key in set(current) | set(expected)
+            if current.get(key, 0) != expected.get(key, 0)
+        }
+        HeadcountCounter.objects.all().delete()
+        HeadcountCounter.objects.bulk_create([
+            HeadcountCounter(department=d, status=s, join_month=m, user_active=a, count=n)
+            for (d, s, m, a), n in expected.items()
+        ])
+    return drift
+
+
+def headcount_queryset():
+    this_month = timezone.now().date().replace(day=1)
+    return (
+        HeadcountCounter.objects.filter(count__gt=0)
+        .values('department')
+        .annotate(
+            total=Sum('count'),
+            active=Sum('count', filter=Q(user_active=True), default=0),
+            new=Sum('count', filter=Q(join_month=this_month), default=0),
+        )
+        .order_by('department')
+    )
+
+
+def headcount_stats():
+    """Same figures as stats.dashboard_stats() for all employees, read from the counters table."""
+    dept_stats = {}
+    active_employees = new_employees = 0
+    for row in headcount_queryset():
+        dept_stats[row['department']] = row['total']
+        active_employees += row['active']
+        new_employees += row['new']
+
+    return {
+        'total_employees': sum(dept_stats.values()),
+        'active_employees': active_employees,
+        'departments': len(dept_stats),
+        'new_employees': new_employees,
+        'dept_stats': dept_stats,
+    }
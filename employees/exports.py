@@ -0,0 +1,214 @@
+import csv
+import json
+import tempfile
+import traceback
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+from docx import Document
+
+from .models import Employee, ExportJob
+
+
+# Rows are fetched in primary-key pages of this size (one query each), so the
+# streaming exports keep a flat memory profile regardless of headcount. A
+# server-side cursor would not do: on MySQL iterator() buffers the whole
+# result set in the client.
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_HEADERS = ['First Name', 'Last Name', 'Department', 'Email', 'Phone', 'Address', 'Join Date', 'Position', 'Status']
+EXPORT_JSON_KEYS = ['first_name', 'last_name', 'department', 'email', 'phone', 'address', 'join_date', 'position', 'status']
+
+# Only the exported columns are selected, no model instances are built.
+EXPORT_FIELDS = (
+    'user__first_name', 'user__last_name', 'department', 'user__email',
+    'phone', 'address', 'join_date', 'position', 'status',
+)
+
+# Job progress is written back to the database every this many rows.
+EXPORT_PROGRESS_EVERY = 500
+
+# A job left 'running' for longer than this is assumed to belong to a dead
+# worker and is handed out again.
+EXPORT_JOB_STALE_AFTER = timedelta(minutes=getattr(settings, 'EXPORT_JOB_STALE_MINUTES', 30))
+
+EXPORT_JOB_FILES = {
+    'pdf': ('employees.pdf', 'application/pdf'),
+    'word': ('employees.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+}
+
+
+def export_queryset(after_id=None):
+    """Employees in primary-key order, optionally resuming after a given id."""
+    employees = Employee.objects.order_by('id')
+    if after_id is not None:
+        employees = employees.filter(id__gt=after_id)
+    return employees.values_list('id', *EXPORT_FIELDS)
+
+
+def iter_export_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """The rows of an export_queryset() as lists of up to chunk_size, by primary key range."""
+    last_pk = None
+    while True:
+        chunk = list((queryset if last_pk is None else queryset.filter(id__gt=last_pk))[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+def export_rows(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield (id, row) pairs, row being a list of strings ordered like EXPORT_HEADERS."""
+    if queryset is None:
+        queryset = export_queryset()
+    chunks = iter_export_chunks(queryset, chunk_size)
+    for pk, first_name, last_name, department, email, phone, address, join_date, position, status in chain.from_iterable(chunks):
+        # A NULL first name means the LEFT JOIN found no linked user.
+        has_user = first_name is not None
+        yield pk, [
+            first_name if has_user else 'N/A',
+            last_name if has_user else 'N/A',
+            department,
+            email if has_user else 'No Email',
+            phone or '',
+            address or '',
+            str(join_date),
+            position,
+            status,
+        ]
+
+
+class Echo:
+    """File-like object whose write() hands the value back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    for _pk, row in rows:
+        yield writer.writerow(row)
+
+
+def _json_record(pk, row):
+    record = {'id': pk}
+    record.update(zip(EXPORT_JSON_KEYS, row))
+    return json.dumps(record)
+
+
+def stream_json_array(rows):
+    """Serialize rows as one JSON array, written element by element."""
+    separator = '['
+    for pk, row in rows:
+        yield separator + _json_record(pk, row)
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+def stream_ndjson(rows):
+    """Serialize rows as newline-delimited JSON, one object per line."""
+    for pk, row in rows:
+        yield _json_record(pk, row) + '\n'
+
+
+# ------------------------------
+# Report rendering (PDF / Word)
+# ------------------------------
+def render_word(rows, fileobj, progress=None):
+    document = Document()
+    document.add_heading("Employee Report", level=1)
+    table = document.add_table(rows=1, cols=9)
+    table.style = 'LightShading-Accent1'
+    for i, header in enumerate(EXPORT_HEADERS):
+        table.rows[0].cells[i].text = header
+    for count, (_pk, row) in enumerate(rows, start=1):
+        row_cells = table.add_row().cells
+        for i, value in enumerate(row):
+            row_cells[i].text = value
+        if progress:
+            progress(count)
+    document.save(fileobj)
+
+
+def render_pdf(rows, fileobj, progress=None):
+    doc = SimpleDocTemplate(fileobj, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+    elements.append(Paragraph("Employee Report", styles['Heading1']))
+    data = [EXPORT_HEADERS]
+    for count, (_pk, row) in enumerate(rows, start=1):
+        data.append(row)
+        if progress:
+            progress(count)
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#d9d9d9')),
+        ('TEXTCOLOR',(0,0),(-1,0),colors.black),
+        ('ALIGN',(0,0),(-1,-1),'CENTER'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,0), 12),
+        ('BOTTOMPADDING', (0,0), (-1,0), 8),
+        ('GRID', (0,0), (-1,-1), 1, colors.black)
+    ]))
+    elements.append(table)
+    doc.build(elements)
+
+
+RENDERERS = {
+    'pdf': render_pdf,
+    'word': render_word,
+}
+
+
+# ------------------------------
+# Export jobs (database-backed queue, no broker)
+# ------------------------------
+def claim_next_job():
+    """Atomically move the oldest pending job to 'running' and return it, or None."""
+    stale_before = timezone.now() - EXPORT_JOB_STALE_AFTER
+    ExportJob.objects.filter(status='running', started_at__lt=stale_before).update(status='pending')
+
+    for job in ExportJob.objects.filter(status='pending').order_by('created_at', 'id')[:10]:
+        # The conditional update is the lock: only one worker can flip the row.
+        claimed = ExportJob.objects.filter(pk=job.pk, status='pending').update(
+            status='running', started_at=timezone.now(), progress=0, error=''
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_export_job(job):
+    """Render the report for a claimed job and attach it as the job artifact."""
+    total = Employee.objects.count()
+    ExportJob.objects.filter(pk=job.pk).update(total=total)
+
+    def progress(count):
+        if count % EXPORT_PROGRESS_EVERY == 0 or count == total:
+            ExportJob.objects.filter(pk=job.pk).update(progress=count)
+
+    filename, _content_type = EXPORT_JOB_FILES[job.format]
+    try:
+        with tempfile.TemporaryFile() as fileobj:
+            RENDERERS[job.format](export_rows(), fileobj, progress)
+            fileobj.seek(0)
+            job.artifact.save(f"{job.pk}_{filename}", File(fileobj), save=False)
+        ExportJob.objects.filter(pk=job.pk).update(
+            status='done', artifact=job.artifact.name, progress=total, finished_at=timezone.now()
+        )
+    except Exception:
+        ExportJob.objects.filter(pk=job.pk).update(
+            status='failed', error=traceback.format_exc(), finished_at=timezone.now()
+        )
+    job.refresh_from_db()
+    return job
@@ -1,5 +1,14 @@
+from functools import partial
+
 from django import forms
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from authentication.models import normalize_email_key
+from authentication.provisioning import credentials, initial_password
 from .models import Employee
+from .thumbnails import schedule_thumbnails
+from .usernames import create_user_with_username
 
 
 class EmployeeForm(forms.ModelForm):
@@ -24,28 +33,40 @@ class EmployeeForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.credentials = None
         if self.instance and self.instance.pk:
             self.fields['first_name'].initial = self.instance.user.first_name
             self.fields['last_name'].initial = self.instance.user.last_name
             self.fields['email'].initial = self.instance.user.email
+
+    def clean_email(self):
+        # Emails are the login name, so they must stay unique (case-insensitively).
+        email = self.cleaned_data['email']
+        others = get_user_model().objects.filter(email_key=normalize_email_key(email))
+        if self.instance.user_id:
+            others = others.exclude(pk=self.instance.user_id)
+        if others.exists():
+            raise forms.ValidationError("A user with that email already exists.")
+        return email
     
     def save(self, commit=True):
         employee = super().save(commit=False)
         
         # Update user fields
         if not employee.pk:
-            # Creating a new employee
-            from authentication.models import User
-            username = self.cleaned_data['email'].split('@')[0]
-            user = User.objects.create_user(
-                username=username,
-                email=self.cleaned_data['email'],
-                password='temp123',
-                first_name=self.cleaned_data['first_name'],
-                last_name=self.cleaned_data['last_name'],
-                user_type='employee'
-            )
-            employee.user = user
+            # Creating a new employee (unless the caller already created the account)
+            if employee.user_id is None:
+                password = initial_password()
+                employee.user = create_user_with_username(
+                    self.cleaned_data['email'].split('@')[0],
+                    email=self.cleaned_data['email'],
+                    password=password,
+                    first_name=self.cleaned_data['first_name'],
+                    last_name=self.cleaned_data['last_name'],
+                    user_type='employee'
+                )
+                # Activation link or temporary password, for the caller to pass on
+                self.credentials = credentials(employee.user, password)
         else:
             # Updating an existing employee
             employee.user.first_name = self.cleaned_data['first_name']
@@ -55,4 +76,7 @@ class EmployeeForm(forms.ModelForm):
         
         if commit:
             employee.save()
+            if 'profile_picture' in self.changed_data:
+                # Thumbnails are rendered off the request once the upload is committed
+                transaction.on_commit(partial(schedule_thumbnails, employee.pk, employee.profile_picture.name))
         return employee
\ No newline at end of file
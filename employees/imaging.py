@@ -0,0 +1,77 @@
+"""
+Pillow-only image helpers. Nothing here imports Django, so the functions can
+run in worker processes (see employees.thumbnails) without setting it up.
+"""
+import os
+import tempfile
+
+from PIL import Image, ImageOps, features
+
+# Derivative name -> (bounding box, crop to fill). Avatars are square crops
+# for the employee list; the detail image keeps the aspect ratio.
+THUMBNAIL_SPECS = {
+    'avatar': ((96, 96), True),
+    'detail': ((480, 480), False),
+}
+THUMBNAIL_QUALITY = 80
+
+
+def output_format():
+    """WebP where this Pillow build can write it, JPEG otherwise."""
+    return 'WEBP' if features.check('webp') else 'JPEG'
+
+
+def extension(image_format):
+    return '.webp' if image_format == 'WEBP' else '.jpg'
+
+
+def _load(source_path, largest_box):
+    """The decoded, upright image (the source file is closed again)."""
+    with Image.open(source_path) as image:
+        # JPEG only: decode at a reduced scale when the output is much smaller.
+        image.draft('RGB', (largest_box[0] * 2, largest_box[1] * 2))
+        return ImageOps.exif_transpose(image)
+
+
+def _save(image, target_path, image_format):
+    if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if image_format == 'WEBP' and 'A' in image.getbands() else 'RGB')
+    directory = os.path.dirname(target_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            image.save(f, image_format, quality=THUMBNAIL_QUALITY, optimize=image_format == 'JPEG')
+        os.replace(tmp, target_path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def fit(image, box, crop):
+    if crop:
+        return ImageOps.fit(image, box, Image.Resampling.LANCZOS)
+    image = image.copy()
+    image.thumbnail(box, Image.Resampling.LANCZOS)
+    return image
+
+
+def render_thumbnails(source_path, target_dir, stem, image_format):
+    """
+    Write every THUMBNAIL_SPECS derivative of `source_path` into `target_dir`
+    as "<stem>_<name><ext>". Returns {name: file name}.
+    """
+    largest = max((box for box, _crop in THUMBNAIL_SPECS.values()), key=lambda box: box[0] * box[1])
+    written = {}
+    with _load(source_path, largest) as image:
+        for name, (box, crop) in THUMBNAIL_SPECS.items():
+            filename = f"{stem}_{name}{extension(image_format)}"
+            _save(fit(image, box, crop), os.path.join(target_dir, filename), image_format)
+            written[name] = filename
+    return written
+
+
+def resize_to(source_path, target_path, box, image_format, crop=False):
+    """Write one resized copy of `source_path` that fits `box`."""
+    with _load(source_path, box) as image:
+        _save(fit(image, box, crop), target_path, image_format)
@@ -0,0 +1,125 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from authentication.models import normalize_email_key
+from authentication.provisioning import credentials, initial_passwords
+
+from . import counters
+from .models import Employee
+from .queries import canonical_choice
+from .search import build_document
+from .stats import invalidate_dashboard_stats
+from .usernames import bulk_create_users
+
+User = get_user_model()
+
+IMPORT_BATCH_SIZE = 500
+
+
+def import_rows(items, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create a User and an Employee for every importable item.
+
+    Existing emails are fetched once per batch and rows are written with
+    bulk_create, so the number of queries grows with the number of batches,
+    not the number of rows. Everything runs in one transaction. Accounts
+    are provisioned per settings.ACCOUNT_PROVISIONING: an activation link
+    each, or a temporary password each (hashed across a process pool).
+    Returns {'imported_count': int, 'rejected': [{'row', 'email', 'reason'}],
+    'accounts': [{'row', 'username', 'activation_path' or 'temporary_password'}]}.
+    """
+    rejected = []
+    accounts = []
+    seen_emails = set()
+    imported = 0
+
+    with transaction.atomic():
+        for offset in range(0, len(items), batch_size):
+            imported += _import_batch(items[offset:offset + batch_size], offset, seen_emails, rejected, accounts)
+        # bulk_create sends no post_save signals.
+        transaction.on_commit(invalidate_dashboard_stats)
+
+    return {'imported_count': imported, 'rejected': rejected, 'accounts': accounts}
+
+
+def _import_batch(batch, offset, seen_emails, rejected, accounts):
+    def reject(index, email, reason):
+        rejected.append({'row': index, 'email': email, 'reason': reason})
+
+    candidates = []
+    for index, item in enumerate(batch, start=offset):
+        if not isinstance(item, dict):
+            reject(index, None, 'Row is not an object')
+            continue
+        email = (item.get('email') or '').strip()
+        if not email:
+            reject(index, None, 'Missing email')
+            continue
+        if normalize_email_key(email) in seen_emails:
+            reject(index, email, 'Duplicate email in import')
+            continue
+        seen_emails.add(normalize_email_key(email))
+        candidates.append((index, email, item))
+
+    if not candidates:
+        return 0
+
+    existing = set(User.objects.filter(
+        email_key__in={normalize_email_key(email) for _, email, _ in candidates}
+    ).values_list('email_key', flat=True))
+    rows = []
+    for index, email, item in candidates:
+        if normalize_email_key(email) in existing:
+            reject(index, email, 'Email already exists')
+        else:
+            rows.append((index, email, item))
+
+    if not rows:
+        return 0
+
+    # Hashed up front: build_user runs again if the usernames have to be reallocated.
+    passwords = initial_passwords(len(rows))
+
+    def build_user(username, index):
+        _row, email, item = rows[index]
+        return User(
+            username=username,
+            email=email,
+            # bulk_create() skips User.save(), which normally sets this.
+            email_key=normalize_email_key(email),
+            password=passwords[index][1],
+            first_name=item.get('first_name') or '',
+            last_name=item.get('last_name') or '',
+            user_type='employee',
+        )
+
+    users = bulk_create_users([email.split('@')[0] for _row, email, _item in rows], build_user)
+    if not connection.features.can_return_rows_from_bulk_insert:
+        # MySQL does not hand back auto-increment ids from a multi-row INSERT.
+        ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'id'))
+        for user in users:
+            user.id = ids[user.username]
+
+    employees = []
+    for user, (row, _email, item), (password, _encoded) in zip(users, rows, passwords):
+        accounts.append({'row': row, 'username': user.username, **credentials(user, password)})
+        # Store the canonical choice values ('active' -> 'Active') so list
+        # filters can match with plain equality.
+        department = item.get('department', '')
+        department = canonical_choice('department', department) or department
+        status = item.get('status', 'Active')
+        status = canonical_choice('status', status) or status
+        employees.append(Employee(
+            user=user,
+            department=department,
+            position=item.get('position', ''),
+            status=status,
+            search_document=build_document(
+                user.first_name, user.last_name, user.email, department, item.get('position', ''),
+            ),
+        ))
+    Employee.objects.bulk_create(employees)
+    counters.apply_deltas(Counter(counters.instance_bucket(employee) for employee in employees))
+    return len(users)
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from employees.backups import FULL_BACKUP_EXCLUDE, dump_models
+from employees.importer import import_rows
+from employees.jsonl_backup import dump_jsonl, load_jsonl
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _clear_dumped_tables():
+    with connection.constraint_checks_disabled():
+        for model in reversed(dump_models()):
+            for field in model._meta.many_to_many:
+                field.remote_field.through._base_manager.all()._raw_delete(connection.alias)
+            model._base_manager.all()._raw_delete(connection.alias)
+
+
+def _timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def _size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare dump/restore time and size of dumpdata/loaddata against dump_jsonl/load_jsonl "
+        "on seeded employees (changes are rolled back)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help="Employees to seed before measuring.")
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='bench_backup_')
+        fixture = os.path.join(workdir, 'backup.json')
+        jsonl_dir = os.path.join(workdir, 'jsonl')
+        exclude = []
+        for label in FULL_BACKUP_EXCLUDE:
+            exclude += ['--exclude', label]
+
+        results = {}
+        try:
+            with transaction.atomic():
+                import_rows([
+                    {
+                        'email': f"bench.backup.{i}@example.com",
+                        'first_name': 'Bench',
+                        'last_name': f"User{i}",
+                        'department': 'IT',
+                        'position': 'Engineer',
+                        'status': 'Active',
+                    }
+                    for i in range(options['rows'])
+                ])
+
+                def dumpdata():
+                    with open(fixture, 'w', encoding='utf-8') as f:
+                        call_command('dumpdata', *exclude, '--indent', '2', stdout=f)
+
+                results['dumpdata/loaddata'] = [_timed(dumpdata)]
+                results['dump_jsonl/load_jsonl'] = [_timed(lambda: dump_jsonl(jsonl_dir))]
+
+                for label, restore in (
+                    ('dumpdata/loaddata', lambda: call_command('loaddata', fixture, verbosity=0)),
+                    ('dump_jsonl/load_jsonl', lambda: load_jsonl(jsonl_dir)),
+                ):
+                    try:
+                        with transaction.atomic():
+                            _clear_dumped_tables()
+                            results[label].append(_timed(restore))
+                            raise _Rollback
+                    except _Rollback:
+                        pass
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{'format':<24} {'bytes':>12} {'dump s':>8} {'restore s':>10}")
+        for label, path in (('dumpdata/loaddata', fixture), ('dump_jsonl/load_jsonl', jsonl_dir)):
+            dump_seconds, restore_seconds = results[label]
+            self.stdout.write(f"{label:<24} {_size(path):>12} {dump_seconds:>8.3f} {restore_seconds:>10.3f}")
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from employees.importer import IMPORT_BATCH_SIZE, import_rows
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measure queries and wall time of the bulk employee import for growing row counts (changes are rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100, 1000, 5000])
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--provisioning', choices=['activation', 'password'],
+            help="Override settings.ACCOUNT_PROVISIONING ('password' hashes one temporary password per row).",
+        )
+
+    def handle(self, *args, **options):
+        if options['provisioning']:
+            with override_settings(ACCOUNT_PROVISIONING=options['provisioning']):
+                return self._run(options)
+        return self._run(options)
+
+    def _run(self, options):
+        batch_size = options['batch_size']
+        self.stdout.write(f"{'rows':>8} {'batches':>8} {'queries':>8} {'seconds':>8}")
+        for count in options['rows']:
+            items = [
+                {
+                    'email': f"bench.import.{i}@example.com",
+                    'first_name': 'Bench',
+                    'last_name': f"User{i}",
+                    'department': 'IT',
+                    'position': 'Engineer',
+                    'status': 'Active',
+                }
+                for i in range(count)
+            ]
+            try:
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        result = import_rows(items, batch_size=batch_size)
+                        elapsed = time.perf_counter() - started
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+            batches = -(-count // batch_size)
+            self.stdout.write(f"{count:>8} {batches:>8} {len(queries):>8} {elapsed:>8.3f}")
+            if result['rejected']:
+                self.stderr.write(f"  {len(result['rejected'])} rows rejected (bench emails already in the database?)")
@@ -0,0 +1,40 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from employees import imaging
+from employees.models import Employee
+from employees.thumbnails import render_args, store_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Render the avatar/detail thumbnails of existing profile pictures in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-render employees that already have thumbnails.")
+        parser.add_argument('--workers', type=int, default=max(settings.THUMBNAIL_WORKERS, 1))
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.exclude(profile_picture='')
+        if not options['force']:
+            employees = employees.filter(avatar_thumbnail='')
+        pending = list(employees.order_by('pk').values_list('pk', 'profile_picture'))
+        if not pending:
+            self.stdout.write("Nothing to do.")
+            return
+
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = [
+                (pk, name, pool.submit(imaging.render_thumbnails, *render_args(name)))
+                for pk, name in pending
+            ]
+            for pk, name, future in futures:
+                try:
+                    store_thumbnails(pk, name, future.result())
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Employee #{pk} ({name}): {e}")
+        self.stdout.write(self.style.SUCCESS(f"Rendered thumbnails for {done} employee(s), {failed} failed."))
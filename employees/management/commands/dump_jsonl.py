@@ -0,0 +1,21 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from employees.backups import SERIALIZE_CHUNK_SIZE
+from employees.jsonl_backup import default_jsonl_dir, dump_jsonl
+
+
+class Command(BaseCommand):
+    help = "Back up every model as gzipped JSON Lines, one file per model, streamed in primary-key chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Directory to write (default: backups/jsonl_<timestamp>).")
+        parser.add_argument('--chunk-size', type=int, default=SERIALIZE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        directory = options['output'] or default_jsonl_dir()
+        manifest = dump_jsonl(directory, options['chunk_size'])
+        size = sum(os.path.getsize(os.path.join(directory, entry['file'])) for entry in manifest['models'])
+        rows = sum(entry['count'] for entry in manifest['models'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rows of {len(manifest['models'])} models to {directory} ({size} bytes)."))
@@ -0,0 +1,123 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from employees.counters import headcount_queryset
+from employees.importer import import_rows
+from employees.models import Employee
+from employees.pagination import KeysetPaginator
+from employees.queries import DEFAULT_SORT_FIELD, filter_employees, order_employees
+from employees.stats import current_month_range, dashboard_stats_queryset
+
+_TABLES = r'(employees_employee|authentication_user)\b'
+
+
+def full_scan_lines(vendor, plan):
+    """
+    Plan lines that read every row of an employee/user table: unindexed scans,
+    and index scans that still have to sort the whole table afterwards.
+    """
+    lines = plan.splitlines()
+    if vendor == 'sqlite':
+        sorts_everything = any('USE TEMP B-TREE FOR ORDER BY' in line for line in lines)
+        return [
+            line for line in lines
+            if re.search(r'\bSCAN ' + _TABLES, line) and (sorts_everything or ' USING ' not in line)
+        ]
+    if vendor == 'mysql':
+        return [
+            line for line in lines
+            if re.search(_TABLES + r' \S+ ALL\b', line)
+            or (re.search(_TABLES + r' \S+ index\b', line) and 'Using filesort' in line)
+        ]
+    if vendor == 'postgresql':
+        return [line for line in lines if re.search(r'Seq Scan on ' + _TABLES, line)]
+    raise CommandError(f"No full-scan detection for the '{vendor}' backend.")
+
+
+class _Rollback(Exception):
+    pass
+
+
+def view_queries(sample_user_id):
+    """(label, queryset) for every query the list and dashboard views issue."""
+    month_start, next_month_start = current_month_range()
+    keyset = KeysetPaginator(order_employees(filter_employees(), 'join_date'), 'join_date')
+    return [
+        ("employee_list: default sort (first name)",
+         order_employees(filter_employees(), DEFAULT_SORT_FIELD)[:10]),
+        ("employee_list: department filter",
+         order_employees(filter_employees(department='IT'), 'department')[:10]),
+        ("employee_list: department + status filter, sort join_date",
+         order_employees(filter_employees(department='IT', status='active'), 'join_date')[:10]),
+        ("employee_list: status filter, sort join_date",
+         order_employees(filter_employees(status='active'), 'join_date')[:10]),
+        ("employee_list: sort join_date",
+         order_employees(filter_employees(), 'join_date')[:10]),
+        ("employee_list: keyset page (join_date)",
+         keyset.queryset.filter(Q(keyset_value__gt=month_start) | Q(keyset_value=month_start, id__gt=0))
+         .order_by('keyset_value', 'id')[:11]),
+        ("employee_list: search",
+         order_employees(filter_employees(search='engineer'), None, relevance=True)[:10]),
+        ("dashboard (admin): headcount counters",
+         headcount_queryset()),
+        ("dashboard (employee): grouped stats",
+         dashboard_stats_queryset(Employee.objects.filter(user_id=sample_user_id))),
+        ("dashboard: new hires this month",
+         Employee.objects.filter(join_date__gte=month_start, join_date__lt=next_month_start).values('id')),
+        ("dashboard: recent employees",
+         Employee.objects.select_related('user').order_by('-join_date')[:5]),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed employees inside a rolled-back transaction, EXPLAIN every employee_list "
+        "and dashboard query and report the ones that scan a whole table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=2000, help="Employees to create for the planner to work with.")
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not only the offending lines.")
+        parser.add_argument('--strict', action='store_true', help="Exit with an error if any query does a full scan.")
+
+    def handle(self, *args, **options):
+        departments = [choice for choice, _ in Employee._meta.get_field('department').choices]
+        statuses = [choice for choice, _ in Employee._meta.get_field('status').choices]
+        seed = [
+            {
+                'email': f"explain.{i}@example.com",
+                'first_name': f"First{i}",
+                'last_name': f"Last{i}",
+                'department': departments[i % len(departments)],
+                'position': 'Engineer' if i % 3 else 'Analyst',
+                'status': statuses[i % len(statuses)],
+            }
+            for i in range(options['seed'])
+        ]
+
+        scans, checked = [], 0
+        try:
+            with transaction.atomic():
+                import_rows(seed)
+                sample_user_id = Employee.objects.values_list('user_id', flat=True).first()
+                for label, queryset in view_queries(sample_user_id):
+                    plan = queryset.explain()
+                    offending = full_scan_lines(connection.vendor, plan)
+                    checked += 1
+                    if offending:
+                        scans.append(label)
+                        self.stdout.write(self.style.WARNING(f"[FULL SCAN] {label}"))
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f"[ok]        {label}"))
+                    for line in (plan.splitlines() if options['verbose_plans'] else offending):
+                        self.stdout.write(f"              {line}")
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{len(scans)} of {checked} queries scan a whole table.")
+        if scans and options['strict']:
+            raise CommandError("Full table scans found: " + "; ".join(scans))
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.jsonl_backup import JSONL_BATCH_SIZE, load_jsonl
+from employees.models import Employee
+from employees.stats import invalidate_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Restore a dump_jsonl backup with batched bulk inserts and deferred constraint checks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--batch-size', type=int, default=JSONL_BATCH_SIZE)
+        parser.add_argument('--flush', action='store_true', help="Empty the database first (required if it has data).")
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            call_command('flush', interactive=False, verbosity=0)
+        elif get_user_model().objects.exists() or Employee.objects.exists():
+            raise CommandError("The database already has users or employees; rerun with --flush to replace them.")
+
+        try:
+            loaded = load_jsonl(options['directory'], options['batch_size'], stdout=self.stdout)
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        invalidate_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(f"Restored {sum(loaded.values())} rows of {len(loaded)} models."))
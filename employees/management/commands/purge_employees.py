@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.purge import PURGE_BATCH_SIZE, purge_employees
+from employees.queries import filter_employees
+
+
+class Command(BaseCommand):
+    help = "Delete employees and their user accounts in primary-key batches, reporting progress."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', default='', help="Only employees of this department.")
+        parser.add_argument('--status', default='', help="Only employees with this status.")
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE)
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive')
+
+    def handle(self, *args, **options):
+        employees = filter_employees(options['department'], options['status'])
+        count = employees.count()
+        if not count:
+            self.stdout.write("No employees match.")
+            return
+        if options['interactive']:
+            answer = input(f"Delete {count} employee(s) and their user accounts? Type 'yes' to continue: ")
+            if answer != 'yes':
+                raise CommandError("Purge cancelled.")
+
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total} deleted")
+
+        deleted = purge_employees(employees, options['batch_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} employee(s)."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from employees.counters import rebuild_counters
+from employees.stats import invalidate_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the headcount counters table from the employee table and report any drift."
+
+    def handle(self, *args, **options):
+        drift = rebuild_counters()
+        invalidate_dashboard_stats()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Counters were already exact."))
+            return
+        for (department, status, join_month, user_active), (stored, actual) in sorted(drift.items(), key=str):
+            self.stdout.write(
+                f"{department}/{status}/{join_month:%Y-%m}/{'active' if user_active else 'inactive'}: {stored} -> {actual}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Repaired {len(drift)} counter bucket(s)."))
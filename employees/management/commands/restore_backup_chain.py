@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.backups import BackupChainError, backup_chain, restore_chain
+from employees.media_store import MediaStoreError, restore_media
+from employees.models import Employee
+from employees.stats import invalidate_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Restore the latest full backup under backups/ and replay the incremental "
+        "backups taken after it (up to --until)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help="File name of the last backup to apply (default: the latest).")
+        parser.add_argument('--list', action='store_true', help="Only print the chain that would be restored.")
+        parser.add_argument('--flush', action='store_true', help="Empty the database first (required if it has data).")
+        parser.add_argument('--media', action='store_true', help="Also restore the media snapshot taken with the full backup.")
+
+    def handle(self, *args, **options):
+        try:
+            chain = backup_chain(options['until'])
+        except BackupChainError as e:
+            raise CommandError(str(e))
+
+        for manifest in chain:
+            self.stdout.write(f"{manifest['kind']:<12} {manifest['file']}  (taken {manifest['taken_at']})")
+        if options['list']:
+            return
+
+        if options['flush']:
+            call_command('flush', interactive=False, verbosity=0)
+        elif get_user_model().objects.exists() or Employee.objects.exists():
+            raise CommandError("The database already has users or employees; rerun with --flush to replace them.")
+
+        restore_chain(chain, stdout=self.stdout)
+        if options['media']:
+            if not chain[0].get('media_snapshot'):
+                raise CommandError(f"{chain[0]['file']} has no media snapshot.")
+            try:
+                count = restore_media(chain[0]['media_snapshot'])
+            except MediaStoreError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"Restored {count} media file(s) from {chain[0]['media_snapshot']}")
+        invalidate_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(f"Restored {len(chain)} backup(s)."))
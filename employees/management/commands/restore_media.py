@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.media_store import MediaStoreError, list_snapshots, restore_media
+
+
+class Command(BaseCommand):
+    help = "Restore media files from a snapshot in the content-addressed backup store."
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', nargs='?', help="Snapshot name (default: the latest).")
+        parser.add_argument('--target', help="Directory to restore into (default: MEDIA_ROOT).")
+        parser.add_argument('--list', action='store_true', help="List the available snapshots.")
+
+    def handle(self, *args, **options):
+        snapshots = list_snapshots()
+        if options['list']:
+            for name in snapshots:
+                self.stdout.write(name)
+            return
+        if not snapshots:
+            raise CommandError("No media snapshots found.")
+        name = options['snapshot'] or snapshots[-1]
+        try:
+            count = restore_media(name, options['target'])
+        except MediaStoreError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Restored {count} file(s) from {name}."))
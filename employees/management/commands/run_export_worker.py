@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from employees.exports import claim_next_job, run_export_job
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF/Word export jobs outside the request/response cycle."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty instead of polling.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep between polls of an empty queue.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Export worker started.")
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            self.stdout.write(f"Rendering {job}...")
+            job = run_export_job(job)
+            if job.status == 'done':
+                self.stdout.write(self.style.SUCCESS(f"Export #{job.id} ready: {job.artifact.name}"))
+            else:
+                self.stderr.write(f"Export #{job.id} failed:\n{job.error}")
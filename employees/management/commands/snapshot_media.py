@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from employees.backups import prune_media_snapshots
+from employees.media_store import snapshot_media
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot media/ into the content-addressed backup store (only new contents "
+        "are copied) and prune old snapshots (except those a database backup still "
+        "references) and unreferenced blobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=settings.MEDIA_BACKUP_KEEP, help="Snapshots to keep.")
+        parser.add_argument('--no-prune', action='store_true', help="Only take the snapshot.")
+
+    def handle(self, *args, **options):
+        name, stats = snapshot_media()
+        self.stdout.write(self.style.SUCCESS(
+            f"{name}: {stats['files']} files, {stats['hashed']} hashed, "
+            f"{stats['new_blobs']} new blobs ({stats['bytes_written']} bytes written)"
+        ))
+        if options['no_prune']:
+            return
+        snapshots, blobs, freed = prune_media_snapshots(options['keep'])
+        self.stdout.write(f"Pruned {snapshots} snapshot(s) and {blobs} blob(s), {freed} bytes freed.")
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+MEDIA_STORE_DIR = os.path.join(settings.BASE_DIR, 'backups', 'media_store')
+BLOCK_SIZE = 64 * 1024
+# Blobs younger than this are never garbage-collected, so a snapshot that is
+# still copying (and has not written its manifest yet) keeps its new blobs.
+GC_GRACE_SECONDS = 3600
+
+
+class MediaStoreError(Exception):
+    pass
+
+
+# Layout under MEDIA_STORE_DIR:
+#   blobs/<sha[:2]>/<sha>          file contents, written once, never modified
+#   snapshots/<name>.json          {"name", "taken_at", "files": {relpath: {"sha256", "size", "mtime_ns"}}}
+def _blob_path(digest):
+    return os.path.join(MEDIA_STORE_DIR, 'blobs', digest[:2], digest)
+
+
+def _snapshot_dir():
+    return os.path.join(MEDIA_STORE_DIR, 'snapshots')
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _store_blob(path, digest):
+    """Copy `path` into the store under `digest` unless already there. Returns bytes written."""
+    target = _blob_path(digest)
+    if os.path.exists(target):
+        # Fresh mtime: a concurrent prune must not collect it before our manifest lands.
+        os.utime(target)
+        return 0
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as dst, open(path, 'rb') as src:
+            shutil.copyfileobj(src, dst, BLOCK_SIZE)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return os.path.getsize(target)
+
+
+def open_blob(digest):
+    return open(_blob_path(digest), 'rb')
+
+
+def list_snapshots():
+    """Snapshot names, oldest first."""
+    if not os.path.isdir(_snapshot_dir()):
+        return []
+    return sorted(name[:-len('.json')] for name in os.listdir(_snapshot_dir()) if name.endswith('.json'))
+
+
+def load_snapshot(name):
+    path = os.path.join(_snapshot_dir(), f'{name}.json')
+    # Names can come from a request (?since=): no path components.
+    if not name or os.path.basename(name) != name or name.startswith('.') or not os.path.exists(path):
+        raise MediaStoreError(f"No media snapshot named '{name}'.")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ------------------------------
+# Snapshot / restore
+# ------------------------------
+def snapshot_media(media_root=None):
+    """
+    Record the current media tree as a new snapshot. Files whose size and
+    mtime match the previous snapshot are not even re-read; new contents
+    are stored once per distinct hash. Returns (snapshot name, stats dict).
+    """
+    media_root = media_root or settings.MEDIA_ROOT
+    snapshots = list_snapshots()
+    previous = load_snapshot(snapshots[-1])['files'] if snapshots else {}
+    stats = {'files': 0, 'hashed': 0, 'new_blobs': 0, 'bytes_written': 0}
+    files = {}
+
+    for root, dirs, names in os.walk(media_root):
+        dirs.sort()
+        for filename in sorted(names):
+            path = os.path.join(root, filename)
+            relpath = os.path.relpath(path, media_root).replace(os.sep, '/')
+            stat = os.stat(path)
+            known = previous.get(relpath)
+            if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns \
+                    and os.path.exists(_blob_path(known['sha256'])):
+                digest = known['sha256']
+            else:
+                digest = _hash_file(path)
+                stats['hashed'] += 1
+                written = _store_blob(path, digest)
+                if written:
+                    stats['new_blobs'] += 1
+                    stats['bytes_written'] += written
+            files[relpath] = {'sha256': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            stats['files'] += 1
+
+    taken_at = timezone.now()
+    name = f"media_{taken_at:%Y%m%d_%H%M%S_%f}"
+    os.makedirs(_snapshot_dir(), exist_ok=True)
+    path = os.path.join(_snapshot_dir(), f'{name}.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'name': name, 'taken_at': taken_at.isoformat(), 'files': files}, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+    return name, stats
+
+
+def restore_media(name, target=None):
+    """Write the files of snapshot `name` under `target` (default MEDIA_ROOT). Returns the file count."""
+    target = target or settings.MEDIA_ROOT
+    files = load_snapshot(name)['files']
+    missing = [relpath for relpath, entry in files.items() if not os.path.exists(_blob_path(entry['sha256']))]
+    if missing:
+        raise MediaStoreError(f"Snapshot '{name}' references missing blobs: {', '.join(sorted(missing)[:5])}")
+    for relpath, entry in files.items():
+        destination = os.path.join(target, *relpath.split('/'))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(_blob_path(entry['sha256']), destination)
+        os.utime(destination, ns=(entry['mtime_ns'], entry['mtime_ns']))
+    return len(files)
+
+
+# ------------------------------
+# Retention
+# ------------------------------
+def prune_snapshots(keep, pinned=()):
+    """
+    Delete all but the `keep` newest snapshots, except those named in
+    `pinned` (still referenced by a retained database backup), then every
+    blob no remaining snapshot references.
+    Returns (snapshots removed, blobs removed, bytes freed).
+    """
+    names = list_snapshots()
+    pinned = set(pinned)
+    doomed = [name for name in (names[:-keep] if keep > 0 else names) if name not in pinned]
+    for name in doomed:
+        os.remove(os.path.join(_snapshot_dir(), f'{name}.json'))
+
+    referenced = set()
+    for name in list_snapshots():
+        referenced.update(entry['sha256'] for entry in load_snapshot(name)['files'].values())
+
+    blobs_removed = bytes_freed = 0
+    cutoff = time.time() - GC_GRACE_SECONDS
+    blob_root = os.path.join(MEDIA_STORE_DIR, 'blobs')
+    for root, _dirs, names in os.walk(blob_root):
+        for filename in names:
+            path = os.path.join(root, filename)
+            if filename in referenced or os.path.getmtime(path) > cutoff:
+                continue
+            bytes_freed += os.path.getsize(path)
+            os.remove(path)
+            blobs_removed += 1
+    return len(doomed), blobs_removed, bytes_freed
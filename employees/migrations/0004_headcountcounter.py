@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:25
+
+from django.db import migrations, models
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def populate_counters(apps, schema_editor):
+    Employee = apps.get_model('employees', 'Employee')
+    HeadcountCounter = apps.get_model('employees', 'HeadcountCounter')
+    rows = (
+        Employee.objects.order_by()
+        .annotate(month=TruncMonth('join_date'), active=Coalesce('user__is_active', Value(False)))
+        .values('department', 'status', 'month', 'active')
+        .annotate(total=Count('id'))
+    )
+    HeadcountCounter.objects.bulk_create([
+        HeadcountCounter(
+            department=row['department'], status=row['status'], join_month=row['month'],
+            user_active=row['active'], count=row['total'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0003_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeadcountCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=50)),
+                ('status', models.CharField(max_length=20)),
+                ('join_month', models.DateField()),
+                ('user_active', models.BooleanField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('department', 'status', 'join_month', 'user_active'), name='unique_headcount_bucket')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
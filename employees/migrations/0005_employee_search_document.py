@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:27
+
+from django.db import migrations, models
+
+from employees.search import build_document, install_search_index, uninstall_search_index
+
+
+def backfill_search_documents(apps, schema_editor):
+    Employee = apps.get_model('employees', 'Employee')
+    employees = Employee.objects.select_related('user')
+    batch = []
+    for employee in employees.iterator(chunk_size=1000):
+        user = employee.user
+        employee.search_document = build_document(
+            user.first_name if user else '', user.last_name if user else '',
+            user.email if user else '', employee.department, employee.position,
+        )
+        batch.append(employee)
+        if len(batch) == 1000:
+            Employee.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    Employee.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_headcountcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def canonicalize_choices(apps, schema_editor):
+    """Rewrite e.g. status 'active' (old imports) to the choice value 'Active'."""
+    Employee = apps.get_model('employees', 'Employee')
+    HeadcountCounter = apps.get_model('employees', 'HeadcountCounter')
+    for field_name in ('department', 'status'):
+        for choice, _label in Employee._meta.get_field(field_name).choices:
+            (
+                Employee.objects.filter(**{f'{field_name}__iexact': choice})
+                .exclude(**{field_name: choice})
+                .update(**{field_name: choice})
+            )
+
+    # The counters are keyed by these values, so recount them.
+    HeadcountCounter.objects.all().delete()
+    rows = (
+        Employee.objects.order_by()
+        .annotate(month=TruncMonth('join_date'), active=Coalesce('user__is_active', Value(False)))
+        .values('department', 'status', 'month', 'active')
+        .annotate(total=Count('id'))
+    )
+    HeadcountCounter.objects.bulk_create([
+        HeadcountCounter(
+            department=row['department'], status=row['status'], join_month=row['month'],
+            user_active=row['active'], count=row['total'],
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_employee_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_choices, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['department', 'status', 'join_date'], name='employee_dept_status_join_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['status', 'join_date'], name='employee_status_join_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['join_date'], name='employee_join_date_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0007_deletedrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='avatar_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='profile_pics/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='detail_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='profile_pics/thumbs/'),
+        ),
+    ]
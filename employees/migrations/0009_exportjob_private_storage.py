@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 05:26
+
+import os
+import shutil
+
+import employees.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_artifacts(apps, schema_editor):
+    """Move reports rendered so far out of the public MEDIA_ROOT."""
+    ExportJob = apps.get_model('employees', 'ExportJob')
+    for name in ExportJob.objects.exclude(artifact='').values_list('artifact', flat=True).iterator():
+        source = os.path.join(settings.MEDIA_ROOT, name)
+        if os.path.exists(source):
+            target = os.path.join(settings.PRIVATE_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0008_employee_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='artifact',
+            field=models.FileField(blank=True, storage=employees.storage.PrivateFileSystemStorage(), upload_to='exports/'),
+        ),
+        migrations.RunPython(move_artifacts, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.utils import timezone
 from django.conf import settings
 
+from .storage import private_storage
+
 class Employee(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -22,6 +24,10 @@ class Employee(models.Model):
     join_date = models.DateField(default=timezone.now)
     address = models.TextField(blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True)
+    # Downscaled copies of profile_picture (see employees.thumbnails), written
+    # after the upload is saved; empty until then.
+    avatar_thumbnail = models.ImageField(upload_to='profile_pics/thumbs/', blank=True, editable=False)
+    detail_thumbnail = models.ImageField(upload_to='profile_pics/thumbs/', blank=True, editable=False)
     phone = models.CharField(max_length=15, blank=True, null=True)
     status = models.CharField(
         max_length=20,
@@ -34,6 +40,21 @@ class Employee(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Normalized name/email/department/position text backing the full-text
+    # search index (see employees.search); kept in sync by signals.
+    search_document = models.TextField(blank=True, default='', editable=False)
+
+    class Meta:
+        # Access paths of employee_list (filter department/status, sort
+        # join_date) and of the dashboard (join_date range, recent hires).
+        # Check coverage with `manage.py explain_queries`.
+        indexes = [
+            models.Index(fields=['department', 'status', 'join_date'], name='employee_dept_status_join_idx'),
+            models.Index(fields=['status', 'join_date'], name='employee_status_join_idx'),
+            models.Index(fields=['join_date'], name='employee_join_date_idx'),
+            # Incremental backups select rows changed since the last one.
+            models.Index(fields=['updated_at'], name='employee_updated_at_idx'),
+        ]
 
     def __str__(self):
         if self.user:
@@ -49,3 +70,93 @@ class Employee(models.Model):
     @property
     def email(self):
         return self.user.email if self.user else "No Email"
+
+    @property
+    def avatar_url(self):
+        """Small square photo for lists; the original until its thumbnail exists."""
+        picture = self.avatar_thumbnail or self.profile_picture
+        return picture.url if picture else None
+
+    @property
+    def detail_photo_url(self):
+        picture = self.detail_thumbnail or self.profile_picture
+        return picture.url if picture else None
+
+
+class HeadcountCounter(models.Model):
+    """
+    Number of employees per (department, status, month of joining, account
+    active) bucket. Maintained on every write by employees.counters, so the
+    dashboard never has to scan the employee table.
+    """
+    department = models.CharField(max_length=50)
+    status = models.CharField(max_length=20)
+    join_month = models.DateField()
+    user_active = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['department', 'status', 'join_month', 'user_active'],
+                name='unique_headcount_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.department}/{self.status}/{self.join_month:%Y-%m}: {self.count}"
+
+
+class ExportJob(models.Model):
+    FORMAT_CHOICES = [
+        ('pdf', 'PDF'),
+        ('word', 'Word'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='export_jobs'
+    )
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    artifact = models.FileField(upload_to='exports/', storage=private_storage, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_format_display()} export #{self.id} ({self.status})"
+
+    @property
+    def is_ready(self):
+        return self.status == 'done' and bool(self.artifact)
+
+
+class DeletedRecord(models.Model):
+    """
+    Tombstone for a deleted User or Employee row, so incremental backups
+    (employees.backups) can replay deletions as well as changes.
+    """
+    model = models.CharField(max_length=100)
+    object_pk = models.CharField(max_length=64)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.model} #{self.object_pk} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
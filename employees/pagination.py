@@ -0,0 +1,135 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+
+from .models import Employee
+
+# Sort keys that support keyset pagination. Nullable columns are coalesced so
+# the (value, id) key is totally ordered.
+KEYSET_SORT_KEYS = {
+    'user__first_name': Coalesce('user__first_name', Value('')),
+    'department': F('department'),
+    'join_date': F('join_date'),
+    'status': F('status'),
+}
+
+
+def encode_cursor(sort_field, value, pk, direction):
+    payload = json.dumps({'s': sort_field, 'v': str(value), 'id': pk, 'd': direction})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _sort_model_field(sort_field):
+    field, model = None, Employee
+    for name in sort_field.split('__'):
+        field = model._meta.get_field(name)
+        model = field.related_model
+    return field
+
+
+def decode_cursor(cursor, sort_field):
+    """Return (value, id, direction) or None for a malformed or foreign cursor."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if payload['s'] != sort_field or payload['d'] not in ('next', 'prev'):
+            return None
+        # Cursors come from the client: a value the column cannot hold would
+        # otherwise fail while the seek filter is built.
+        value = _sort_model_field(sort_field).to_python(payload['v'])
+        return value, int(payload['id']), payload['d']
+    except (ValueError, TypeError, KeyError, ValidationError):
+        return None
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator; iterates like a Paginator page."""
+
+    def __init__(self, object_list, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Pages through a queryset ordered by (sort key, id) using "seek" filters
+    instead of OFFSET, so every page costs the same whatever its depth and
+    no COUNT(*) is needed.
+    """
+
+    def __init__(self, queryset, sort_field, per_page=10, values=None):
+        self.sort_field = sort_field
+        self.per_page = per_page
+        self.queryset = queryset.annotate(keyset_value=KEYSET_SORT_KEYS[sort_field])
+        if values is not None:
+            # Project to dicts of just these columns (plus the key).
+            self.queryset = self.queryset.values('id', 'keyset_value', *values)
+
+    @staticmethod
+    def _position(row):
+        if isinstance(row, dict):
+            return row['keyset_value'], row['id']
+        return row.keyset_value, row.id
+
+    def page(self, cursor=None):
+        position = decode_cursor(cursor, self.sort_field) if cursor else None
+        if position is None:
+            rows = list(self.queryset.order_by('keyset_value', 'id')[:self.per_page + 1])
+            has_more, has_before = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            value, pk, direction = position
+            if direction == 'next':
+                seek = Q(keyset_value__gt=value) | Q(keyset_value=value, id__gt=pk)
+                rows = list(self.queryset.filter(seek).order_by('keyset_value', 'id')[:self.per_page + 1])
+                has_more, has_before = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                seek = Q(keyset_value__lt=value) | Q(keyset_value=value, id__lt=pk)
+                rows = list(self.queryset.filter(seek).order_by('-keyset_value', '-id')[:self.per_page + 1])
+                has_more, has_before = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+
+        next_cursor = prev_cursor = None
+        if rows and has_more:
+            next_cursor = encode_cursor(self.sort_field, *self._position(rows[-1]), 'next')
+        if rows and has_before:
+            prev_cursor = encode_cursor(self.sort_field, *self._position(rows[0]), 'prev')
+        return KeysetPage(rows, next_cursor, prev_cursor)
+
+
+def approximate_row_count(model, using='default'):
+    """
+    The planner's row estimate for a whole table (no scan), or None when the
+    database does not keep one.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return max(int(row[0]), 0) if row and row[0] is not None else None
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+
+from django.conf import settings
+
+from . import imaging
+
+try:
+    import fcntl
+except ImportError:  # Windows: requests are only collapsed within a process
+    fcntl = None
+
+MAX_DIMENSION = 2000
+# Eviction trims the cache to this fraction of PHOTO_CACHE_MAX_BYTES, so it
+# does not run again on the very next miss.
+LOW_WATER_RATIO = 0.9
+
+# key -> [lock, number of threads holding or waiting for it]; an entry is
+# dropped by the last of them, so every waiter shares the same lock.
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+_size_lock = threading.Lock()
+_cached_bytes = None
+
+
+def cache_key(source_path, width, height, crop):
+    """
+    Identity of one rendition: the source file (path, size, mtime) and the
+    requested box. Doubles as the strong ETag, since equal keys mean equal bytes.
+    """
+    stat = os.stat(source_path)
+    identity = f"{source_path}:{stat.st_size}:{stat.st_mtime_ns}:{width}x{height}:{int(crop)}:{imaging.output_format()}"
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(settings.PHOTO_CACHE_DIR, key[:2], key + imaging.extension(imaging.output_format()))
+
+
+def _acquire_key_lock(key):
+    with _key_locks_guard:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    entry[0].acquire()
+
+
+def _release_key_lock(key):
+    with _key_locks_guard:
+        entry = _key_locks[key]
+        entry[0].release()
+        entry[1] -= 1
+        if not entry[1]:
+            del _key_locks[key]
+
+
+def _iter_entries():
+    for root, _dirs, files in os.walk(settings.PHOTO_CACHE_DIR):
+        for name in files:
+            if name.endswith(('.webp', '.jpg')):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+
+def _account(added_bytes, keep):
+    """Track the cache size (scanned once per process) and evict past the cap."""
+    global _cached_bytes
+    with _size_lock:
+        if _cached_bytes is None:
+            _cached_bytes = sum(size for _path, size, _mtime in _iter_entries())
+        else:
+            _cached_bytes += added_bytes
+        if _cached_bytes > settings.PHOTO_CACHE_MAX_BYTES:
+            _cached_bytes = _evict(int(settings.PHOTO_CACHE_MAX_BYTES * LOW_WATER_RATIO), keep)
+
+
+def _evict(target_bytes, keep):
+    """
+    Delete least recently used renditions (hits refresh mtime) down to
+    target_bytes, sparing `keep`, the one about to be served.
+    """
+    entries = sorted(_iter_entries(), key=lambda entry: entry[2])
+    total = sum(size for _path, size, _mtime in entries)
+    for path, size, _mtime in entries:
+        if total <= target_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+def _render(source_path, path, width, height, crop):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'w') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Another process may have rendered it while we waited.
+            if not os.path.exists(path):
+                imaging.resize_to(source_path, path, (width, height), imaging.output_format(), crop)
+                _account(os.path.getsize(path), keep=path)
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    try:
+        os.remove(path + '.lock')
+    except FileNotFoundError:
+        pass
+
+
+def get_rendition(source_path, width, height, crop=False, key=None):
+    """
+    Path of the cached resize of `source_path`, rendering it on a miss.
+    Concurrent misses for the same key wait for one render (threads in this
+    process via a lock, other processes via flock) instead of all resizing.
+    """
+    key = key or cache_key(source_path, width, height, crop)
+    path = _cache_path(key)
+    try:
+        os.utime(path)  # LRU: a hit makes it the most recently used
+        return path
+    except FileNotFoundError:
+        pass
+
+    _acquire_key_lock(key)
+    try:
+        if not os.path.exists(path):
+            _render(source_path, path, width, height, crop)
+    finally:
+        _release_key_lock(key)
+    return path
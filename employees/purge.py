@@ -0,0 +1,123 @@
+import threading
+import traceback
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+
+from authentication.middleware import invalidate_cached_users
+
+from . import counters
+from .models import DeletedRecord, Employee
+from .stats import invalidate_dashboard_stats
+
+PURGE_BATCH_SIZE = 1000
+_FILE_FIELDS = ('profile_picture', 'avatar_thumbnail', 'detail_thumbnail')
+
+
+# ------------------------------
+# Profile picture cleanup
+# ------------------------------
+def _remove_files(names):
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            traceback.print_exc()
+
+
+def remove_files_in_background(names):
+    """Delete storage files on a daemon thread, so the caller (a request) does not wait on disk I/O."""
+    if names:
+        threading.Thread(target=_remove_files, args=(list(names),), daemon=True).start()
+
+
+def orphaned_files(names):
+    """The file names (pictures or their thumbnails) no remaining employee still refers to."""
+    names = set(filter(None, names))
+    if not names:
+        return set()
+    still_used = set()
+    for field in _FILE_FIELDS:
+        still_used.update(Employee.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    return names - still_used
+
+
+# ------------------------------
+# Set-based deletes
+# ------------------------------
+def _delete_users(user_ids):
+    """
+    Set-based equivalent of User.objects.filter(pk__in=user_ids).delete().
+    The per-row User delete signals (counters, tombstones, dashboard and
+    request.user caches) are replaced by the purge's own bulk bookkeeping,
+    so related rows are handled relation by relation instead of one
+    collector run per user.
+    """
+    User = get_user_model()
+    for relation in User._meta.related_objects:
+        if relation.many_to_many:
+            continue
+        related = relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': user_ids})
+        if relation.on_delete is models.CASCADE:
+            related.delete()
+        elif relation.on_delete is models.SET_NULL:
+            related.update(**{relation.field.name: None})
+    for field in User._meta.many_to_many:
+        field.remote_field.through._base_manager.filter(**{f'{field.m2m_field_name()}_id__in': user_ids}).delete()
+    User._base_manager.filter(pk__in=user_ids)._raw_delete(User._base_manager.db)
+    transaction.on_commit(lambda: invalidate_cached_users(user_ids))
+
+
+def _purge_batch(rows):
+    employee_ids = [row[0] for row in rows]
+    user_ids = [row[1] for row in rows if row[1] is not None]
+
+    deltas = Counter()
+    for row in rows:
+        deltas[counters.bucket(*row[2:6])] -= 1
+    counters.apply_deltas(deltas)
+    DeletedRecord.objects.bulk_create(
+        [DeletedRecord(model=Employee._meta.label_lower, object_pk=str(pk)) for pk in employee_ids]
+        + [DeletedRecord(model=get_user_model()._meta.label_lower, object_pk=str(pk)) for pk in user_ids]
+    )
+    # Nothing references employees, so one DELETE without the collector.
+    Employee.objects.filter(pk__in=employee_ids)._raw_delete(Employee.objects.db)
+    if user_ids:
+        _delete_users(user_ids)
+
+
+def purge_employees(queryset=None, batch_size=PURGE_BATCH_SIZE, progress=None):
+    """
+    Delete employees and their user accounts in primary-key batches of
+    `batch_size`, one short transaction each, so no lock is held for the
+    whole table. Profile pictures left without an owner are removed on a
+    background thread after each batch commits. `progress(done, total)` is
+    called after every batch. Returns the number of employees deleted.
+    """
+    queryset = (queryset if queryset is not None else Employee.objects.all()).order_by('pk')
+    total = queryset.count()
+    done, last_pk = 0, 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.filter(pk__gt=last_pk).values_list(
+                    'pk', 'user_id', 'department', 'status', 'join_date', 'user__is_active', *_FILE_FIELDS
+                )[:batch_size]
+            )
+            if not rows:
+                break
+            _purge_batch(rows)
+            files = orphaned_files(name for row in rows for name in row[6:])
+            transaction.on_commit(lambda files=files: remove_files_in_background(files))
+        last_pk = rows[-1][0]
+        done += len(rows)
+        if progress:
+            progress(done, total)
+
+    if done:
+        invalidate_dashboard_stats()
+    return done
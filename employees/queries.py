@@ -0,0 +1,40 @@
+from .models import Employee
+from .search import search_employees
+
+VALID_SORT_FIELDS = ['user__first_name', 'department', 'join_date', 'status']
+DEFAULT_SORT_FIELD = 'user__first_name'
+
+
+def canonical_choice(field_name, value):
+    """
+    Map a case-insensitive value onto the stored choice value, e.g. 'active' ->
+    'Active', so filters can use plain equality (and the indexes) instead of iexact.
+    Returns None for values that are not a valid choice.
+    """
+    value = (value or '').strip().lower()
+    for choice, _label in Employee._meta.get_field(field_name).choices:
+        if choice.lower() == value:
+            return choice
+    return None
+
+
+def filter_employees(department='', status='', search=''):
+    """The employee_list queryset for the given filters, not yet ordered."""
+    employees = Employee.objects.select_related('user')
+    for field_name, value in (('department', department), ('status', status)):
+        if value:
+            choice = canonical_choice(field_name, value)
+            employees = employees.filter(**{field_name: choice}) if choice else employees.none()
+    if search:
+        employees = search_employees(employees, search)
+    return employees
+
+
+def clean_sort(sort_by):
+    return sort_by if sort_by in VALID_SORT_FIELDS else DEFAULT_SORT_FIELD
+
+
+def order_employees(employees, sort_by, relevance=False):
+    if relevance:
+        return employees.order_by('-search_rank', 'id')
+    return employees.order_by(clean_sort(sort_by), 'id')
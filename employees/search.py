@@ -0,0 +1,177 @@
+import re
+import unicodedata
+
+from django.db import OperationalError, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'employees_employee_fts'
+
+_SQLITE_FTS_STATEMENTS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        search_document, content='employees_employee', content_rowid='id'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON employees_employee BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON employees_employee BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) VALUES ('delete', old.id, old.search_document);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF search_document ON employees_employee BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document) VALUES ('delete', old.id, old.search_document);
+        INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+    END""",
+]
+_SQLITE_TRIGGERS = {f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'}
+
+_MYSQL_INDEX = 'employees_employee_search_ft'
+MYSQL_MIN_TOKEN_SIZE = 3
+_POSTGRES_INDEX = 'employees_employee_search_gin'
+
+_backends = {}
+
+
+# ------------------------------
+# Search documents
+# ------------------------------
+def normalize(text):
+    """Lowercase, strip accents and reduce to space separated alphanumeric tokens."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def build_document(first_name, last_name, email, department, position):
+    return normalize(' '.join([first_name or '', last_name or '', email or '', department or '', position or '']))
+
+
+def employee_document(employee):
+    user = employee.user if employee.user_id else None
+    return build_document(
+        user.first_name if user else '',
+        user.last_name if user else '',
+        user.email if user else '',
+        employee.department,
+        employee.position,
+    )
+
+
+# ------------------------------
+# Database index
+# ------------------------------
+def install_search_index(connection):
+    """Create the native full-text index for this database (idempotent)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            columns = [column.name for column in connection.introspection.get_table_description(cursor, 'employees_employee')]
+            if 'search_document' not in columns:
+                # Migrated back below the search_document field.
+                return
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'employees_employee'"
+            )
+            missing_triggers = _SQLITE_TRIGGERS - {row[0] for row in cursor.fetchall()}
+            if not missing_triggers:
+                return
+            try:
+                cursor.execute(_SQLITE_FTS_STATEMENTS[0])
+            except OperationalError:
+                # SQLite built without FTS5: search falls back to LIKE.
+                return
+            for statement in _SQLITE_FTS_STATEMENTS[1:]:
+                cursor.execute(statement)
+            # Rows written while the triggers were missing (table rebuilds
+            # during migrations drop them) are re-indexed from the content table.
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        elif connection.vendor == 'mysql':
+            cursor.execute("SHOW INDEX FROM employees_employee WHERE Key_name = %s", [_MYSQL_INDEX])
+            if not cursor.fetchall():
+                cursor.execute(f"ALTER TABLE employees_employee ADD FULLTEXT INDEX {_MYSQL_INDEX} (search_document)")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {_POSTGRES_INDEX} ON employees_employee "
+                "USING GIN (to_tsvector('simple', search_document))"
+            )
+    _backends.pop(connection.alias, None)
+
+
+def uninstall_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for trigger in _SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif connection.vendor == 'mysql':
+            cursor.execute("SHOW INDEX FROM employees_employee WHERE Key_name = %s", [_MYSQL_INDEX])
+            if cursor.fetchall():
+                cursor.execute(f"ALTER TABLE employees_employee DROP INDEX {_MYSQL_INDEX}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP INDEX IF EXISTS {_POSTGRES_INDEX}")
+    _backends.pop(connection.alias, None)
+
+
+def _backend(alias):
+    if alias not in _backends:
+        connection = connections[alias]
+        backend = connection.vendor
+        if backend == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                backend = 'sqlite' if cursor.fetchone() else 'fallback'
+        elif backend not in ('mysql', 'postgresql'):
+            backend = 'fallback'
+        _backends[alias] = backend
+    return _backends[alias]
+
+
+# ------------------------------
+# Querying
+# ------------------------------
+def search_employees(queryset, query):
+    """
+    Restrict an Employee queryset to rows matching every word of `query` as a
+    prefix, annotated with `search_rank` (higher is more relevant).
+    """
+    tokens = normalize(query).split()
+    if not tokens:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    backend = _backend(queryset.db)
+    if backend == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(search_rank=RawSQL(
+            f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = employees_employee.id",
+            [match], output_field=FloatField(),
+        ))
+
+    if backend == 'mysql':
+        # InnoDB does not index words shorter than innodb_ft_min_token_size (3).
+        indexed = [token for token in tokens if len(token) >= MYSQL_MIN_TOKEN_SIZE]
+        for token in tokens:
+            if len(token) < MYSQL_MIN_TOKEN_SIZE:
+                queryset = queryset.filter(search_document__contains=token)
+        if not indexed:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        match = ' '.join(f'+{token}*' for token in indexed)
+        return queryset.annotate(search_rank=RawSQL(
+            "MATCH (employees_employee.search_document) AGAINST (%s IN BOOLEAN MODE)",
+            [match], output_field=FloatField(),
+        )).filter(search_rank__gt=0)
+
+    if backend == 'postgresql':
+        match = ' & '.join(f'{token}:*' for token in tokens)
+        return queryset.filter(RawSQL(
+            "to_tsvector('simple', employees_employee.search_document) @@ to_tsquery('simple', %s)",
+            [match], output_field=BooleanField(),
+        )).annotate(search_rank=RawSQL(
+            "ts_rank(to_tsvector('simple', employees_employee.search_document), to_tsquery('simple', %s))",
+            [match], output_field=FloatField(),
+        ))
+
+    condition = Q()
+    for token in tokens:
+        condition &= Q(search_document__contains=token)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
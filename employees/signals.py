@@ -0,0 +1,138 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters
+from .models import DeletedRecord, Employee
+from .search import build_document, employee_document, install_search_index
+from .stats import invalidate_dashboard_stats
+
+_BUCKET_FIELDS = {'department', 'status', 'join_date', 'user', 'user_id'}
+
+
+def _is_login_update(update_fields):
+    # Logging in only touches last_login, which none of the derived data uses.
+    return bool(update_fields) and set(update_fields) == {'last_login'}
+
+
+def _invalidate_on_commit(user_id):
+    transaction.on_commit(lambda: invalidate_dashboard_stats(user_id))
+
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def employee_changed(sender, instance, **kwargs):
+    _invalidate_on_commit(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if _is_login_update(update_fields):
+        return
+    _invalidate_on_commit(instance.pk)
+
+
+# ------------------------------
+# Headcount counters
+# ------------------------------
+# Fixtures loaded with raw=True are not counted; run `manage.py rebuild_counters`
+# after loaddata.
+@receiver(pre_save, sender=Employee)
+def remember_employee_bucket(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._headcount_bucket = None
+    instance._headcount_skip = raw or bool(update_fields and not _BUCKET_FIELDS & set(update_fields))
+    if instance.pk and not instance._headcount_skip:
+        instance._headcount_bucket = counters.stored_bucket(instance.pk)
+
+
+@receiver(post_save, sender=Employee)
+def count_saved_employee(sender, instance, **kwargs):
+    if getattr(instance, '_headcount_skip', False):
+        return
+    counters.move(getattr(instance, '_headcount_bucket', None), counters.instance_bucket(instance))
+
+
+@receiver(pre_delete, sender=Employee)
+def remember_deleted_employee_bucket(sender, instance, **kwargs):
+    instance._headcount_bucket = counters.stored_bucket(instance.pk)
+
+
+@receiver(post_delete, sender=Employee)
+def uncount_deleted_employee(sender, instance, **kwargs):
+    counters.move(getattr(instance, '_headcount_bucket', None), None)
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_user_active(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._was_active = None
+    if raw or not instance.pk or (update_fields and 'is_active' not in update_fields):
+        return
+    instance._was_active = (
+        get_user_model().objects.filter(pk=instance.pk).values_list('is_active', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def recount_user_active(sender, instance, **kwargs):
+    was_active = getattr(instance, '_was_active', None)
+    if was_active is None or was_active == instance.is_active:
+        return
+    row = Employee.objects.filter(user_id=instance.pk).values_list('department', 'status', 'join_date').first()
+    if row:
+        counters.move(counters.bucket(*row, was_active), counters.bucket(*row, instance.is_active))
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def recount_deleted_user(sender, instance, **kwargs):
+    # on_delete=SET_NULL detaches the employee with a plain UPDATE, without signals.
+    row = Employee.objects.filter(user_id=instance.pk).values_list('department', 'status', 'join_date', 'user__is_active').first()
+    if row and row[3]:
+        counters.move(counters.bucket(*row), counters.bucket(*row[:3], False))
+
+
+# ------------------------------
+# Search documents
+# ------------------------------
+@receiver(pre_save, sender=Employee)
+def refresh_search_document(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or update_fields is not None:
+        return
+    instance.search_document = employee_document(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_user_search_document(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or _is_login_update(update_fields):
+        return
+    row = Employee.objects.filter(user_id=instance.pk).values_list('department', 'position').first()
+    if row:
+        document = build_document(instance.first_name, instance.last_name, instance.email, *row)
+        # Name/email edits change what the employee record shows, so bump updated_at too.
+        Employee.objects.filter(user_id=instance.pk).update(search_document=document, updated_at=timezone.now())
+
+
+def restore_search_index(sender, using, **kwargs):
+    # On SQLite, migrations that rebuild employees_employee drop the FTS triggers.
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and Employee._meta.db_table in connection.introspection.table_names():
+        install_search_index(connection)
+
+
+# ------------------------------
+# Incremental backups
+# ------------------------------
+@receiver(post_delete, sender=Employee)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def record_deletion(sender, instance, **kwargs):
+    DeletedRecord.objects.create(model=sender._meta.label_lower, object_pk=str(instance.pk))
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def touch_detached_employee(sender, instance, **kwargs):
+    # SET_NULL leaves updated_at alone; bump it so the detached employee is
+    # picked up by the next delta backup (and by API ETags).
+    Employee.objects.filter(user_id=instance.pk).update(updated_at=timezone.now())
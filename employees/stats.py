@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .counters import headcount_stats
+
+
+def current_month_range():
+    """
+    [first day of this month, first day of next month) as dates.
+
+    Filtering on this range instead of join_date__month/__year keeps the
+    predicate sargable, so it can use the join_date index.
+    """
+    month_start = timezone.now().date().replace(day=1)
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
+    return month_start, next_month_start
+
+
+def dashboard_stats_queryset(employees):
+    month_start, next_month_start = current_month_range()
+    return (
+        employees.order_by()
+        .values('department')
+        .annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(user__is_active=True)),
+            new=Count('id', filter=Q(join_date__gte=month_start, join_date__lt=next_month_start)),
+        )
+        .order_by('department')
+    )
+
+
+def dashboard_stats(employees):
+    """
+    Headcount figures for the dashboard, computed with one grouped query.
+
+    `employees` is the (already scoped) Employee queryset; the per-department
+    rows are summed in Python for the overall totals.
+    """
+    dept_stats = {}
+    active_employees = new_employees = 0
+    for row in dashboard_stats_queryset(employees):
+        dept_stats[row['department']] = row['total']
+        active_employees += row['active']
+        new_employees += row['new']
+
+    return {
+        'total_employees': sum(dept_stats.values()),
+        'active_employees': active_employees,
+        'departments': len(dept_stats),
+        'new_employees': new_employees,
+        'dept_stats': dept_stats,
+    }
+
+
+# ------------------------------
+# Cached dashboard statistics
+# ------------------------------
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+
+
+def _stats_cache_key(user_id=None):
+    # The month is part of the key so "new employees" rolls over on its own.
+    scope = 'admin' if user_id is None else f"user:{user_id}"
+    return f"dashboard:stats:{scope}:{timezone.now():%Y%m}"
+
+
+def cached_dashboard_stats(employees, user_id=None):
+    """dashboard_stats() served from the dashboard cache; user_id=None is the admin-wide scope."""
+    cache = caches[DASHBOARD_CACHE_ALIAS]
+    key = _stats_cache_key(user_id)
+    stats = cache.get(key)
+    if stats is None:
+        # The admin-wide figures come from the maintained counters table.
+        stats = headcount_stats() if user_id is None else dashboard_stats(employees)
+        cache.set(key, stats)
+    return stats
+
+
+def invalidate_dashboard_stats(user_id=None):
+    """Drop the admin-wide stats and, if given, the stats of one user."""
+    keys = [_stats_cache_key()]
+    if user_id is not None:
+        keys.append(_stats_cache_key(user_id))
+    caches[DASHBOARD_CACHE_ALIAS].delete_many(keys)
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import cached_property
+
+
+class PrivateFileSystemStorage(FileSystemStorage):
+    """
+    Files under PRIVATE_MEDIA_ROOT, which is outside MEDIA_ROOT and has no
+    URL: they are only ever handed out by views that check permissions
+    (e.g. export_job_download).
+    """
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PRIVATE_MEDIA_ROOT)
+
+    @cached_property
+    def base_url(self):
+        # FileSystemStorage.url() raises ValueError for a storage without one.
+        return None
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PRIVATE_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+
+private_storage = PrivateFileSystemStorage()
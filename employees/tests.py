@@ -1,3 +1,865 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import Permission, UserManager as DjangoUserManager
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from authentication.models import User, UserManager
+from . import backups, counters, jsonl_backup, media_store, photo_cache, search
+from .importer import import_rows
+from .exports import claim_next_job, export_queryset, export_rows, run_export_job
+from .models import DeletedRecord, Employee, ExportJob
+from .pagination import KeysetPaginator, encode_cursor
+from .purge import purge_employees
+from .queries import filter_employees, order_employees
+from .thumbnails import schedule_thumbnails
+from .usernames import allocate_usernames, bulk_create_users, create_user_with_username
+
+
+# Every cache is swapped for a local-memory one (so clearing it in a test
+# cannot touch the real on-disk caches), with the session LRU and the
+# request.user cache switched on as they are with SHARED_CACHE_URL set.
+_test_caches = override_settings(
+    CACHES={alias: {**config, 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+            for alias, config in settings.CACHES.items()},
+    SESSION_LRU_SIZE=5000,
+    AUTH_USER_CACHE_TIMEOUT=300,
+)
+
+
+def setUpModule():
+    _test_caches.enable()
+
+
+def tearDownModule():
+    _test_caches.disable()
+
+
+class DashboardQueryCountTests(TestCase):
+    """The dashboard must not issue one query per department."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin1', 'admin@example.com', 'pw', user_type='admin')
+        cls.employee_user = User.objects.create_user('emp1', 'emp@example.com', 'pw', first_name='Emp', last_name='One')
+        Employee.objects.create(user=cls.employee_user, department='IT', position='Developer')
+        for i, department in enumerate(['HR', 'Finance', 'Marketing', 'Sales', 'Operations']):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw')
+            Employee.objects.create(user=user, department=department, position='Staff')
+
+    def setUp(self):
+        caches['dashboard'].clear()
+        caches[settings.AUTH_USER_CACHE_ALIAS].clear()
+
+    def get_dashboard(self):
+        captured = {}
+
+        def fake_render(request, template_name, context):
+            # The template is not rendered here, so evaluate what it would use.
+            captured.update(context)
+            [employee.full_name for employee in context['recent_employees']]
+            return HttpResponse()
+
+        with mock.patch('employees.views.render', side_effect=fake_render):
+            self.client.get(reverse('dashboard'))
+        return captured
+
+    def test_admin_dashboard_query_count(self):
+        # user + grouped stats + recent employees (the session written by
+        # force_login is served from the session store's in-process cache)
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(3):
+            context = self.get_dashboard()
+        self.assertEqual(context['total_employees'], 6)
+        self.assertEqual(context['departments'], 6)
+        self.assertEqual(context['dept_stats']['IT'], 1)
+
+    def test_employee_dashboard_query_count(self):
+        self.client.force_login(self.employee_user)
+        with self.assertNumQueries(3):
+            context = self.get_dashboard()
+        self.assertEqual(context['total_employees'], 1)
+        self.assertEqual(context['dept_stats'], {'IT': 1})
+
+    def test_cached_dashboard_skips_stats_query(self):
+        self.client.force_login(self.admin)
+        self.get_dashboard()
+        # recent employees (request.user comes from the user cache)
+        with self.assertNumQueries(1):
+            context = self.get_dashboard()
+        self.assertEqual(context['total_employees'], 6)
+
+    def test_employee_change_invalidates_cached_stats(self):
+        self.client.force_login(self.admin)
+        self.get_dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            Employee.objects.create(department='IT', position='Intern')
+        context = self.get_dashboard()
+        self.assertEqual(context['total_employees'], 7)
+        self.assertEqual(context['dept_stats']['IT'], 2)
+
+
+class ThumbnailNamingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root, THUMBNAIL_WORKERS=0))
+
+    def make_employee(self, name, picture):
+        os.makedirs(os.path.join(self.media_root, 'profile_pics'), exist_ok=True)
+        Image.new('RGB', (200, 150), 'red').save(os.path.join(self.media_root, picture))
+        user = User.objects.create_user(name, f'{name}@example.com', 'pw')
+        return Employee.objects.create(user=user, department='IT', position='Staff', profile_picture=picture)
+
+    def test_pictures_with_the_same_stem_get_separate_thumbnails(self):
+        first = self.make_employee('first', 'profile_pics/same.jpg')
+        second = self.make_employee('second', 'profile_pics/same.png')
+        schedule_thumbnails(first.pk, first.profile_picture.name)
+        schedule_thumbnails(second.pk, second.profile_picture.name)
+        # Re-rendering one employee's thumbnails must leave the other's alone.
+        schedule_thumbnails(first.pk, first.profile_picture.name)
+        first.refresh_from_db()
+        second.refresh_from_db()
+
+        self.assertNotEqual(first.avatar_thumbnail.name, second.avatar_thumbnail.name)
+        self.assertNotEqual(first.detail_thumbnail.name, second.detail_thumbnail.name)
+        for employee in (first, second):
+            for field in (employee.avatar_thumbnail, employee.detail_thumbnail):
+                self.assertTrue(os.path.exists(field.path), field.name)
+
+
+class EmployeeApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin1', 'admin@example.com', 'pw', user_type='admin')
+        for i in range(3):
+            user = User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw', first_name=f'User{i}')
+            Employee.objects.create(user=user, department='IT', position='Staff')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_projects_requested_fields_only(self):
+        response = self.client.get('/employees/api/', {'fields': 'id,first_name'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual([set(row) for row in data['results']], [{'id', 'first_name'}] * 3)
+
+    def test_unknown_field_is_a_400(self):
+        response = self.client.get('/employees/api/', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_unchanged_list_is_a_304_until_a_row_is_deleted(self):
+        etag = self.client.get('/employees/api/')['ETag']
+        self.assertEqual(self.client.get('/employees/api/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Another projection of the same rows has its own tag.
+        self.assertEqual(self.client.get('/employees/api/', {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        Employee.objects.filter(user__username='user0').delete()
+        response = self.client.get('/employees/api/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        # No Last-Modified: it could not reflect the delete.
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class BackupChainTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.media_root = os.path.join(root, 'media')
+        os.makedirs(os.path.join(self.media_root, 'profile_pics'))
+        self.enterContext(mock.patch.object(backups, 'BACKUP_DIR', os.path.join(root, 'backups')))
+        self.enterContext(mock.patch.object(media_store, 'MEDIA_STORE_DIR', os.path.join(root, 'store')))
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root, MEDIA_BACKUP_KEEP=1, BACKUP_KEEP_CHAINS=2))
+
+    def backup(self, minutes_ago, incremental=False):
+        # Backup files are named to the second, so each one gets its own time.
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(minutes=minutes_ago)):
+            return backups.write_incremental_backup()[0] if incremental else backups.write_full_backup()
+
+    def make_employee(self, name, department='IT'):
+        user = User.objects.create_user(name, f'{name}@example.com', 'pw', first_name=name.title())
+        return Employee.objects.create(user=user, department=department, position='Staff')
+
+    def test_full_and_incremental_backups_restore_as_a_chain(self):
+        kept = self.make_employee('kept')
+        removed = self.make_employee('removed')
+        with open(os.path.join(self.media_root, 'profile_pics', 'kept.jpg'), 'wb') as f:
+            f.write(b'picture')
+        self.backup(60)
+
+        Employee.objects.filter(pk=kept.pk).update(position='Lead', updated_at=timezone.now())
+        removed.delete()
+        added = self.make_employee('added', department='HR')
+        self.backup(0, incremental=True)
+
+        chain = backups.backup_chain()
+        self.assertEqual([manifest['kind'] for manifest in chain], ['full', 'incremental'])
+        Employee.objects.all().delete()
+        User.objects.all().delete()
+        backups.restore_chain(chain)
+
+        self.assertEqual(
+            dict(Employee.objects.values_list('user__username', 'position')),
+            {'kept': 'Lead', 'added': 'Staff'},
+        )
+        self.assertEqual(Employee.objects.get(pk=added.pk).department, 'HR')
+
+        shutil.rmtree(self.media_root)
+        self.assertEqual(media_store.restore_media(chain[0]['media_snapshot']), 1)
+        with open(os.path.join(self.media_root, 'profile_pics', 'kept.jpg'), 'rb') as f:
+            self.assertEqual(f.read(), b'picture')
+
+    def test_broken_chain_is_refused(self):
+        self.make_employee('someone')
+        self.backup(60)
+        self.backup(0, incremental=True)
+        full = backups.backup_chain()[0]
+        os.remove(os.path.join(backups.BACKUP_DIR, full['file']))
+        with self.assertRaises(backups.BackupChainError):
+            backups.backup_chain()
+
+    def write_picture(self, content):
+        with open(os.path.join(self.media_root, 'profile_pics', 'p.jpg'), 'wb') as f:
+            f.write(content)
+
+    def test_retention_expires_old_chains_and_their_media(self):
+        self.enterContext(mock.patch.object(media_store, 'GC_GRACE_SECONDS', -1))
+        for minutes_ago, content in [(90, b'first'), (60, b'second')]:
+            self.write_picture(content)
+            self.backup(minutes_ago)
+        self.backup(45, incremental=True)
+        # MEDIA_BACKUP_KEEP is 1, but both retained chains still need their media.
+        self.assertEqual(len(media_store.list_snapshots()), 2)
+
+        self.write_picture(b'third')
+        self.backup(30)
+        manifests = backups.load_manifests()
+        # BACKUP_KEEP_CHAINS is 2: the first chain is gone, the second keeps its delta.
+        self.assertEqual([manifest['kind'] for manifest in manifests], ['full', 'incremental', 'full'])
+        self.assertEqual(len(os.listdir(backups.BACKUP_DIR)), 2 * len(manifests))
+        self.assertEqual(
+            media_store.list_snapshots(),
+            sorted(manifest['media_snapshot'] for manifest in manifests if manifest['kind'] == 'full'),
+        )
+        # The blob only the first snapshot used has been collected.
+        blobs = [name for _root, _dirs, names in os.walk(os.path.join(media_store.MEDIA_STORE_DIR, 'blobs')) for name in names]
+        self.assertEqual(len(blobs), 2)
+
+    def read_archive(self, **kwargs):
+        with zipfile.ZipFile(BytesIO(b''.join(backups.stream_full_backup(**kwargs)))) as archive:
+            listing = json.loads(archive.read('media_snapshot.json'))
+            media = {name: archive.read(name) for name in archive.namelist() if name.startswith('media/')}
+        return listing, media
+
+    def test_archive_since_an_earlier_snapshot_leaves_out_unchanged_media(self):
+        self.write_picture(b'unchanged')
+        with open(os.path.join(self.media_root, 'profile_pics', 'q.png'), 'wb') as f:
+            f.write(b'old')
+        first, media = self.read_archive()
+        self.assertEqual(set(media), {'media/profile_pics/p.jpg', 'media/profile_pics/q.png'})
+
+        with open(os.path.join(self.media_root, 'profile_pics', 'q.png'), 'wb') as f:
+            f.write(b'new')
+        listing, media = self.read_archive(since=first['name'])
+        self.assertEqual(media, {'media/profile_pics/q.png': b'new'})
+        self.assertEqual(set(listing['files']), {'profile_pics/p.jpg', 'profile_pics/q.png'})
+        self.assertEqual(listing['since'], first['name'])
+
+        for since in ['media_19990101_000000_000000', '../snapshots/x']:
+            with self.assertRaises(media_store.MediaStoreError):
+                backups.stream_full_backup(since=since)
+
+    def test_downloaded_archive_restores_with_loaddata(self):
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pw', user_type='admin')
+        for name in ['ann', 'bob', 'cy']:
+            self.make_employee(name)
+        self.write_picture(b'picture')
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse('create_full_backup'))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertIsNone(archive.testzip())
+            listing = json.loads(archive.read('media_snapshot.json'))
+            self.assertEqual(archive.read('media/profile_pics/p.jpg'), b'picture')
+            dump_dir = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, dump_dir, ignore_errors=True)
+            dump = archive.extract('db_backup.json', dump_dir)
+        self.assertEqual(listing['files']['profile_pics/p.jpg']['size'], len(b'picture'))
+
+        Employee.objects.all().delete()
+        User.objects.all().delete()
+        call_command('loaddata', dump, verbosity=0)
+        self.assertEqual(sorted(Employee.objects.values_list('user__username', flat=True)), ['ann', 'bob', 'cy'])
+        self.assertTrue(User.objects.filter(username='admin', user_type='admin').exists())
+
+
+class UsernameAllocationTests(TestCase):
+    def test_picks_the_lowest_free_suffix_case_insensitively(self):
+        for username in ['john1', 'JOHN2', 'john4', 'johnny1', 'john2x']:
+            User.objects.create_user(username, f'{username}@example.com', 'pw')
+        self.assertEqual(allocate_usernames(['John']), ['john3'])
+
+    def test_batch_with_repeated_bases_gets_distinct_names(self):
+        User.objects.create_user('ann1', 'ann1@example.com', 'pw')
+        self.assertEqual(allocate_usernames(['Ann', 'ann', 'Bob', 'A-n-n']), ['ann2', 'ann3', 'bob1', 'ann4'])
+
+    def test_bases_ending_in_a_digit_use_a_separator(self):
+        User.objects.create_user('u1', 'u1@example.com', 'pw')
+        self.assertEqual(allocate_usernames(['u', 'u0', 'u1', 'u1']), ['u2', 'u0_1', 'u1_1', 'u1_2'])
+
+    def test_empty_base_falls_back_to_user(self):
+        self.assertEqual(allocate_usernames(['', '!!!']), ['user1', 'user2'])
+
+    def test_one_query_for_a_batch(self):
+        with self.assertNumQueries(1):
+            allocate_usernames([f'name{i}' for i in range(50)])
+
+    def test_create_retries_after_losing_a_race(self):
+        User.objects.create_user('kim1', 'kim1@example.com', 'pw')
+        # The first allocation hands out a name someone else took meanwhile.
+        with mock.patch('employees.usernames.allocate_usernames', side_effect=[['kim1'], ['kim2']]):
+            user = create_user_with_username('kim', email='kim@example.com', password='pw')
+        self.assertEqual(user.username, 'kim2')
+
+    def test_email_taken_meanwhile_is_a_validation_error_not_a_retry(self):
+        User.objects.create_user('lee1', 'Lee@example.com', 'pw')
+        allocate = mock.Mock(wraps=allocate_usernames)
+        # Skip the manager's up-front email check, as if the other signup
+        # committed just after it ran.
+        with mock.patch.object(UserManager, '_create_user', DjangoUserManager._create_user), \
+                mock.patch('employees.usernames.allocate_usernames', allocate):
+            with self.assertRaises(ValidationError) as caught:
+                create_user_with_username('lee', email='lee@example.com', password='pw')
+        self.assertIn('email', caught.exception.message_dict)
+        self.assertEqual(allocate.call_count, 1)
+
+    def test_bulk_create_rejects_a_repeated_email(self):
+        def build_user(username, index):
+            return User(username=username, email='Dup@example.com', email_key='dup@example.com')
+
+        with self.assertRaises(ValidationError):
+            bulk_create_users(['dup', 'dup'], build_user)
+        self.assertFalse(User.objects.filter(email_key='dup@example.com').exists())
+
+
+class JsonlBackupTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def snapshot(self):
+        return {
+            'users': list(User.objects.order_by('pk').values()),
+            'employees': list(Employee.objects.order_by('pk').values()),
+        }
+
+    def test_dump_and_load_round_trip(self):
+        manager = User.objects.create_user('manager', 'manager@example.com', 'pw', user_type='admin')
+        manager.user_permissions.add(*Permission.objects.filter(codename__endswith='_employee'))
+        for i, department in enumerate(['IT', 'HR', 'IT']):
+            user = User.objects.create_user(f'emp{i}', f'emp{i}@example.com', 'pw', first_name=f'Émilie {i}')
+            Employee.objects.create(user=user, department=department, position='Staff', address='Line 1\nLine 2')
+        Employee.objects.create(department='Sales', position='Vacant')
+        before = self.snapshot()
+        permissions = set(manager.user_permissions.values_list('codename', flat=True))
+
+        manifest = jsonl_backup.dump_jsonl(self.directory, chunk_size=2)
+        self.assertEqual({entry['model']: entry['count'] for entry in manifest['models']}['employees.employee'], 4)
+        call_command('flush', interactive=False, verbosity=0)
+
+        loaded = jsonl_backup.load_jsonl(self.directory, batch_size=2)
+        self.assertEqual(loaded['authentication.user'], 4)
+        self.assertEqual(self.snapshot(), before)
+        self.assertEqual(set(User.objects.get(pk=manager.pk).user_permissions.values_list('codename', flat=True)), permissions)
+
+    def test_dangling_foreign_key_is_rejected(self):
+        user = User.objects.create_user('emp', 'emp@example.com', 'pw')
+        Employee.objects.create(user=user, department='IT', position='Staff')
+        jsonl_backup.dump_jsonl(self.directory)
+        os.remove(os.path.join(self.directory, 'authentication.user.jsonl.gz'))
+        with open(os.path.join(self.directory, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['models'] = [entry for entry in manifest['models'] if entry['model'] != 'authentication.user']
+        with open(os.path.join(self.directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        call_command('flush', interactive=False, verbosity=0)
+
+        with self.assertRaises(IntegrityError):
+            jsonl_backup.load_jsonl(self.directory)
+        self.assertFalse(Employee.objects.exists())
+
+
+@override_settings(ACCOUNT_PROVISIONING='activation')
+class ImportTests(TestCase):
+    def rows(self, count, start=0):
+        return [
+            {'email': f'person{i}@example.com', 'first_name': 'Person', 'last_name': str(i),
+             'department': 'it', 'position': 'Staff'}
+            for i in range(start, start + count)
+        ]
+
+    def count_queries(self, items, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            import_rows(items, **kwargs)
+        return len(queries)
+
+    def test_rejects_bad_and_duplicate_rows(self):
+        User.objects.create_user('taken', 'Taken@Example.com', 'pw')
+        result = import_rows([
+            {'email': 'new@example.com', 'first_name': 'New', 'department': 'hr', 'status': 'active'},
+            'not an object',
+            {'first_name': 'No email'},
+            {'email': ' NEW@example.com '},
+            {'email': 'taken@example.COM'},
+        ])
+
+        self.assertEqual(result['imported_count'], 1)
+        self.assertEqual(
+            [(reject['row'], reject['reason']) for reject in result['rejected']],
+            [(1, 'Row is not an object'), (2, 'Missing email'), (3, 'Duplicate email in import'),
+             (4, 'Email already exists')],
+        )
+        employee = Employee.objects.get(user__email='new@example.com')
+        self.assertEqual((employee.department, employee.status), ('HR', 'Active'))
+        self.assertEqual(employee.user.email_key, 'new@example.com')
+        self.assertFalse(employee.user.has_usable_password())
+        [account] = result['accounts']
+        self.assertEqual((account['row'], account['username']), (0, employee.user.username))
+        self.assertIn('activation_path', account)
+
+    def test_queries_grow_with_batches_not_rows(self):
+        # The first import also creates the counter row.
+        import_rows(self.rows(1, start=1000))
+        few = self.count_queries(self.rows(3))
+        many = self.count_queries(self.rows(60, start=3))
+        self.assertEqual(few, many)
+        self.assertEqual(User.objects.count(), 64)
+
+        batched = self.count_queries(self.rows(60, start=100), batch_size=20)
+        self.assertLessEqual(batched, few * 3)
+
+    def test_counters_include_imported_rows(self):
+        import_rows(self.rows(5))
+        self.assertEqual(counters.rebuild_counters(), {})
+        self.assertEqual(counters.headcount_stats()['dept_stats'], {'IT': 5})
+
+
+class HeadcountCounterTests(TestCase):
+    def setUp(self):
+        self.employees = []
+        for i, department in enumerate(['IT', 'IT', 'HR']):
+            user = User.objects.create_user(f'emp{i}', f'emp{i}@example.com', 'pw')
+            self.employees.append(Employee.objects.create(user=user, department=department, position='Staff'))
+
+    def assertCountersExact(self):
+        # rebuild_counters() reports every bucket that drifted from the employee table.
+        self.assertEqual(counters.rebuild_counters(), {})
+
+    def test_create_and_edit(self):
+        self.assertEqual(counters.headcount_stats()['dept_stats'], {'HR': 1, 'IT': 2})
+        employee = self.employees[0]
+        employee.department = 'HR'
+        employee.status = 'On Leave'
+        employee.join_date = timezone.now().date() - timedelta(days=400)
+        employee.save()
+        employee.position = 'Lead'
+        employee.save(update_fields=['position'])
+        self.assertEqual(counters.headcount_stats()['dept_stats'], {'HR': 2, 'IT': 1})
+        self.assertCountersExact()
+
+    def test_deactivate_and_reactivate_user(self):
+        user = self.employees[0].user
+        user.is_active = False
+        user.save()
+        self.assertEqual(counters.headcount_stats()['active_employees'], 2)
+        self.assertCountersExact()
+        user.is_active = True
+        user.save(update_fields=['is_active'])
+        self.assertEqual(counters.headcount_stats()['active_employees'], 3)
+        self.assertCountersExact()
+
+    def test_delete_employee_and_user(self):
+        self.employees[0].delete()
+        # The employee stays, detached (SET_NULL) and no longer active.
+        self.employees[2].user.delete()
+        stats = counters.headcount_stats()
+        self.assertEqual((stats['total_employees'], stats['active_employees']), (2, 1))
+        self.assertCountersExact()
+
+
+class PurgeTests(TestCase):
+    def setUp(self):
+        for i in range(4):
+            user = User.objects.create_user(f'it{i}', f'it{i}@example.com', 'pw', is_active=i != 1)
+            Employee.objects.create(user=user, department='IT', position='Staff', profile_picture=f'profile_pics/it{i}.jpg')
+        Employee.objects.create(department='IT', position='Vacant')
+        self.hr_user = User.objects.create_user('hr', 'hr@example.com', 'pw')
+        # Shares a picture with it0, which therefore must not be removed.
+        Employee.objects.create(user=self.hr_user, department='HR', position='Staff', profile_picture='profile_pics/it0.jpg')
+
+    def test_purges_in_batches_and_keeps_counters_exact(self):
+        progress = []
+        with mock.patch('employees.purge.remove_files_in_background') as remove_files, \
+                self.captureOnCommitCallbacks(execute=True):
+            deleted = purge_employees(Employee.objects.filter(department='IT'), batch_size=2,
+                                      progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(progress, [(2, 5), (4, 5), (5, 5)])
+        self.assertEqual(list(Employee.objects.values_list('department', flat=True)), ['HR'])
+        self.assertEqual(list(User.objects.values_list('username', flat=True)), ['hr'])
+        self.assertEqual(counters.rebuild_counters(), {})
+        self.assertEqual(DeletedRecord.objects.filter(model='employees.employee').count(), 5)
+        self.assertEqual(DeletedRecord.objects.filter(model='authentication.user').count(), 4)
+        removed = {name for call in remove_files.call_args_list for name in call.args[0]}
+        self.assertEqual(removed, {'profile_pics/it1.jpg', 'profile_pics/it2.jpg', 'profile_pics/it3.jpg'})
+
+    def test_purge_everything(self):
+        self.assertEqual(purge_employees(batch_size=4), 6)
+        self.assertFalse(Employee.objects.exists())
+        self.assertEqual(counters.headcount_stats()['total_employees'], 0)
+        self.assertEqual(counters.rebuild_counters(), {})
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def make(username, first_name, last_name, department, position, status='Active'):
+            user = User.objects.create_user(username, f'{username}@example.com', 'pw', first_name=first_name, last_name=last_name)
+            return Employee.objects.create(user=user, department=department, position=position, status=status)
+
+        cls.alice = make('alice', 'Alice', 'Martin', 'IT', 'Developer')
+        cls.emilie = make('emilie', 'Émilie', 'Dubois', 'HR', 'Recruiter')
+        cls.martin = make('mmartin', 'Martin', 'Martin', 'Sales', 'Martin Account Manager')
+        cls.bob = make('bob', 'Bob', 'Stone', 'IT', 'Developer', status='On Leave')
+
+    def search(self, query, **filters):
+        return list(order_employees(filter_employees(search=query, **filters), '', relevance=True))
+
+    def test_uses_the_full_text_index(self):
+        self.assertEqual(search._backend('default'), 'sqlite')
+
+    def test_every_word_must_match_as_a_prefix(self):
+        self.assertEqual(self.search('ali dev'), [self.alice])
+        self.assertEqual(set(self.search('develop')), {self.alice, self.bob})
+        self.assertEqual(self.search('alice recruiter'), [])
+
+    def test_accents_case_and_email(self):
+        self.assertEqual(self.search('EMILIE'), [self.emilie])
+        self.assertEqual(self.search('Dubois'), [self.emilie])
+        self.assertEqual(self.search('bob@example'), [self.bob])
+
+    def test_more_relevant_matches_rank_first(self):
+        self.assertEqual(self.search('martin'), [self.martin, self.alice])
+
+    def test_filters_combine_with_search(self):
+        self.assertEqual(self.search('developer', department='it', status='active'), [self.alice])
+        self.assertEqual(self.search('developer', status='on leave'), [self.bob])
+        self.assertEqual(self.search('developer', department='Nowhere'), [])
+
+    def test_document_follows_user_edits(self):
+        user = self.bob.user
+        user.last_name = 'Quartz'
+        user.save()
+        self.assertEqual(self.search('quartz'), [self.bob])
+        self.assertEqual(self.search('stone'), [])
+
+    def test_fallback_without_index(self):
+        with mock.patch.dict(search._backends, {'default': 'fallback'}):
+            self.assertEqual(set(self.search('martin')), {self.martin, self.alice})
+            self.assertEqual(self.search('ali dev'), [self.alice])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        # Repeated names, departments and dates, so ties are broken by id.
+        for i, (first_name, department) in enumerate([
+            ('Cara', 'IT'), ('Abe', 'HR'), ('Cara', 'IT'), ('', 'Sales'),
+            ('Bea', 'IT'), ('Abe', 'HR'), ('Dan', 'Finance'),
+        ]):
+            user = User.objects.create_user(f'emp{i}', f'emp{i}@example.com', 'pw', first_name=first_name)
+            Employee.objects.create(user=user, department=department, position='Staff', join_date=today - timedelta(days=i % 3))
+
+    def walk(self, sort_field):
+        paginator = KeysetPaginator(Employee.objects.all(), sort_field, per_page=3)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return paginator, pages
+
+    def test_next_cursors_visit_every_row_once_in_order(self):
+        for sort_field in ['user__first_name', 'department', 'join_date', 'status']:
+            with self.subTest(sort_field=sort_field):
+                _paginator, pages = self.walk(sort_field)
+                expected = list(Employee.objects.order_by(sort_field, 'id').values_list('id', flat=True))
+                self.assertEqual([employee.id for page in pages for employee in page], expected)
+                self.assertEqual([len(page) for page in pages], [3, 3, 1])
+                self.assertFalse(pages[0].has_previous())
+
+    def test_prev_cursors_return_the_same_pages(self):
+        for sort_field in ['user__first_name', 'join_date']:
+            with self.subTest(sort_field=sort_field):
+                paginator, pages = self.walk(sort_field)
+                page = pages[-1]
+                for expected in reversed(pages[:-1]):
+                    page = paginator.page(page.prev_cursor)
+                    self.assertEqual(list(page), list(expected))
+                self.assertFalse(page.has_previous())
+                self.assertTrue(page.has_next())
+
+    def test_values_projection(self):
+        paginator = KeysetPaginator(Employee.objects.all(), 'department', per_page=2, values=['department'])
+        page = paginator.page()
+        self.assertEqual([row['department'] for row in page], ['Finance', 'HR'])
+        self.assertEqual([row['department'] for row in paginator.page(page.next_cursor)], ['HR', 'IT'])
+
+    def test_bad_or_foreign_cursor_starts_over(self):
+        paginator = KeysetPaginator(Employee.objects.all(), 'department', per_page=3)
+        first = list(paginator.page())
+        for cursor in ['garbage', encode_cursor('join_date', '2020-01-01', 1, 'next')]:
+            self.assertEqual(list(paginator.page(cursor)), first)
+
+        paginator = KeysetPaginator(Employee.objects.all(), 'join_date', per_page=3)
+        first = list(paginator.page())
+        for value in ['garbage', '2020-13-45']:
+            self.assertEqual(list(paginator.page(encode_cursor('join_date', value, 1, 'next'))), first)
+
+    def test_list_view_follows_cursors(self):
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pw', user_type='admin')
+        self.client.force_login(admin)
+        # The list shows 10 rows per page.
+        for i in range(5):
+            Employee.objects.create(department='Marketing', position='Staff')
+
+        def get_context(params):
+            # The templates are not part of these tests.
+            with mock.patch('employees.views.render', return_value=HttpResponse()) as render:
+                self.client.get(reverse('employee_list'), params)
+            return render.call_args.args[2]
+
+        crafted = encode_cursor('join_date', 'garbage', 1, 'next')
+        self.assertEqual(len(get_context({'cursor': crafted, 'sort': 'join_date'})['page_obj']), 10)
+        response = self.client.get(reverse('employee_api'), {'cursor': crafted, 'sort': 'join_date'})
+        self.assertEqual(response.status_code, 200)
+
+        context = get_context({'paging': 'keyset', 'sort': 'department'})
+        self.assertTrue(context['is_keyset'])
+        context = get_context({'cursor': context['next_cursor'], 'sort': 'department'})
+        self.assertEqual([employee.department for employee in context['page_obj']], ['Marketing', 'Sales'])
+        self.assertIsNone(context['next_cursor'])
+        self.assertIsNotNone(context['prev_cursor'])
+
+
+class EmployeePhotoTests(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.media_root = os.path.join(root, 'media')
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root, PHOTO_CACHE_DIR=os.path.join(root, 'photos')))
+        self.enterContext(mock.patch.object(photo_cache, '_cached_bytes', None))
+        os.makedirs(os.path.join(self.media_root, 'profile_pics'))
+        Image.new('RGB', (400, 300), 'blue').save(os.path.join(self.media_root, 'profile_pics', 'p.jpg'))
+
+        user = User.objects.create_user('emp', 'emp@example.com', 'pw')
+        self.employee = Employee.objects.create(user=user, department='IT', position='Staff', profile_picture='profile_pics/p.jpg')
+        self.client.force_login(user)
+
+    def photo(self, width=100, height=100, data=None, **extra):
+        return self.client.get(reverse('employee_photo', args=[self.employee.pk, width, height]), data, **extra)
+
+    def test_renders_once_then_answers_304(self):
+        response = self.photo(data={'crop': '1'})
+        self.assertEqual(response.status_code, 200)
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (100, 100))
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+
+        with mock.patch('employees.views.get_rendition') as get_rendition:
+            response = self.photo(data={'crop': '1'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        get_rendition.assert_not_called()
+
+    def test_etag_depends_on_size_and_source(self):
+        etag = self.photo()['ETag']
+        self.assertNotEqual(self.photo(50, 50)['ETag'], etag)
+        path = os.path.join(self.media_root, 'profile_pics', 'p.jpg')
+        Image.new('RGB', (400, 300), 'red').save(path)
+        os.utime(path, ns=(1, 1))
+        response = self.photo(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_invalid_sizes_are_400(self):
+        for width, height in [(0, 100), (100, 0), (photo_cache.MAX_DIMENSION + 1, 100)]:
+            with self.subTest(width=width, height=height):
+                self.assertEqual(self.photo(width, height).status_code, 400)
+
+    def test_concurrent_misses_render_once(self):
+        source = os.path.join(self.media_root, 'profile_pics', 'p.jpg')
+        resize_to = photo_cache.imaging.resize_to
+        started = threading.Event()
+
+        def slow_resize(*args):
+            started.set()
+            time.sleep(0.1)
+            resize_to(*args)
+
+        with mock.patch.object(photo_cache.imaging, 'resize_to', side_effect=slow_resize) as resize:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                first = pool.submit(photo_cache.get_rendition, source, 80, 80)
+                started.wait()
+                others = [pool.submit(photo_cache.get_rendition, source, 80, 80) for _ in range(3)]
+                paths = {future.result() for future in [first, *others]}
+        self.assertEqual(resize.call_count, 1)
+        self.assertEqual(len(paths), 1)
+        # The last thread out drops the key's lock.
+        self.assertEqual(photo_cache._key_locks, {})
+
+    def test_missing_photo_is_404(self):
+        os.remove(os.path.join(self.media_root, 'profile_pics', 'p.jpg'))
+        self.assertEqual(self.photo().status_code, 404)
+        Employee.objects.filter(pk=self.employee.pk).update(profile_picture='')
+        self.assertEqual(self.photo().status_code, 404)
+
+
+class ExportStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', user_type='admin')
+        user = User.objects.create_user('ann', 'ann@example.com', 'pw', first_name='Ann', last_name='Lee')
+        cls.ann = Employee.objects.create(user=user, department='IT', position='Dev, Senior', phone='555')
+        cls.vacant = Employee.objects.create(department='HR', position='Vacant')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, format, **params):
+        response = self.client.get(reverse('export_employees', args=[format]), params)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_streams_every_row(self):
+        response, content = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0][:4], ['First Name', 'Last Name', 'Department', 'Email'])
+        self.assertEqual(rows[1][:5], ['Ann', 'Lee', 'IT', 'ann@example.com', '555'])
+        self.assertEqual(rows[1][7], 'Dev, Senior')
+        # An employee without a user account.
+        self.assertEqual(rows[2][:4], ['N/A', 'N/A', 'HR', 'No Email'])
+        self.assertEqual(len(rows), 3)
+
+    def test_json_and_ndjson_resume_after_id(self):
+        _response, content = self.export('json')
+        records = json.loads(content)
+        self.assertEqual([record['id'] for record in records], [self.ann.pk, self.vacant.pk])
+        self.assertEqual(records[0]['email'], 'ann@example.com')
+
+        response, content = self.export('ndjson', after_id=self.ann.pk)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], [self.vacant.pk])
+
+        _response, content = self.export('json', after_id=self.vacant.pk)
+        self.assertEqual(json.loads(content), [])
+
+    def test_invalid_after_id_is_400(self):
+        response = self.client.get(reverse('export_employees', args=['json']), {'after_id': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_are_fetched_in_primary_key_pages(self):
+        # Two pages of one row, then an empty page; no cursor held open.
+        with self.assertNumQueries(3):
+            rows = list(export_rows(chunk_size=1))
+        self.assertEqual([pk for pk, _row in rows], [self.ann.pk, self.vacant.pk])
+        with self.assertNumQueries(2):
+            self.assertEqual([pk for pk, _row in export_rows(export_queryset(self.ann.pk), chunk_size=5)], [self.vacant.pk])
+
+
+class ExportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', user_type='admin')
+        cls.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        cls.other = User.objects.create_user('other', 'other@example.com', 'pw')
+        Employee.objects.create(user=cls.owner, department='IT', position='Staff')
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.media_root = os.path.join(root, 'media')
+        self.private_root = os.path.join(root, 'private')
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root, PRIVATE_MEDIA_ROOT=self.private_root))
+
+    def request_export(self, user):
+        self.client.force_login(user)
+        response = self.client.get(reverse('export_employees', args=['pdf']))
+        self.assertEqual(response.status_code, 202)
+        return ExportJob.objects.get(pk=response.json()['id'])
+
+    def test_jobs_are_claimed_oldest_first_and_once(self):
+        first = self.request_export(self.owner)
+        second = self.request_export(self.owner)
+        self.assertEqual(claim_next_job(), first)
+        self.assertEqual(claim_next_job(), second)
+        self.assertIsNone(claim_next_job())
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'running')
+
+    def test_stale_running_job_is_requeued(self):
+        job = self.request_export(self.owner)
+        claim_next_job()
+        self.assertIsNone(claim_next_job())
+        ExportJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(claim_next_job(), job)
+
+    def test_report_is_stored_outside_media_root(self):
+        self.request_export(self.owner)
+        job = run_export_job(claim_next_job())
+        self.assertEqual(job.status, 'done')
+        self.assertTrue(job.artifact.path.startswith(self.private_root + os.sep))
+        self.assertFalse(os.path.exists(self.media_root))
+        with self.assertRaises(ValueError):
+            job.artifact.url
+
+    def test_download_is_limited_to_the_requester_and_admins(self):
+        job = self.request_export(self.owner)
+        download = reverse('export_job_download', args=[job.pk])
+        self.assertEqual(self.client.get(download).status_code, 409)
+        run_export_job(claim_next_job())
+
+        response = self.client.get(download)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(download).status_code, 200)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(download).status_code, 403)
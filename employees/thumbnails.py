@@ -0,0 +1,94 @@
+import hashlib
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection
+
+from . import imaging
+from .models import Employee
+
+THUMBNAIL_DIR = 'profile_pics/thumbs'
+THUMBNAIL_FIELDS = ('avatar_thumbnail', 'detail_thumbnail')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(kind):
+    # Pillow work runs in worker processes; a few dispatcher threads wait on
+    # them and write the results back, keeping both off the request thread.
+    with _pools_lock:
+        if kind not in _pools:
+            if kind == 'process':
+                _pools[kind] = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+            else:
+                _pools[kind] = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS,
+                                                  thread_name_prefix='thumbnails')
+        return _pools[kind]
+
+
+def thumbnail_stem(picture_name):
+    """
+    File name stem of a picture's derivatives. Built from the whole stored
+    name, so same.jpg and same.png (or equal names in other directories)
+    never share thumbnails.
+    """
+    readable = os.path.basename(picture_name).replace('.', '_')
+    return f"{readable}_{hashlib.sha256(picture_name.encode()).hexdigest()[:12]}"
+
+
+def render_args(picture_name):
+    """Arguments for imaging.render_thumbnails() for a stored profile picture."""
+    stem = thumbnail_stem(picture_name)
+    return (default_storage.path(picture_name), default_storage.path(THUMBNAIL_DIR), stem, imaging.output_format())
+
+
+def store_thumbnails(employee_id, picture_name, written):
+    """
+    Record rendered derivatives ({spec name: file name}) unless the employee's
+    picture changed in the meantime, and delete the files they replace.
+    """
+    thumbnails = {f'{name}_thumbnail': f'{THUMBNAIL_DIR}/{filename}' for name, filename in written.items()}
+    previous = Employee.objects.filter(pk=employee_id).values(*THUMBNAIL_FIELDS).first() or {}
+    # update() rather than save(): derivatives are not an edit of the employee.
+    if Employee.objects.filter(pk=employee_id, profile_picture=picture_name).update(**thumbnails):
+        stale = set(previous.values()) - set(thumbnails.values())
+    else:
+        stale = set(thumbnails.values())
+    for name in filter(None, stale):
+        default_storage.delete(name)
+
+
+def clear_thumbnails(employee_id):
+    previous = Employee.objects.filter(pk=employee_id).values(*THUMBNAIL_FIELDS).first() or {}
+    Employee.objects.filter(pk=employee_id, profile_picture='').update(**{field: '' for field in THUMBNAIL_FIELDS})
+    for name in filter(None, previous.values()):
+        default_storage.delete(name)
+
+
+def _render_and_store(employee_id, picture_name):
+    try:
+        written = _pool('process').submit(imaging.render_thumbnails, *render_args(picture_name)).result()
+        store_thumbnails(employee_id, picture_name, written)
+    except Exception:
+        traceback.print_exc()
+    finally:
+        connection.close()
+
+
+def schedule_thumbnails(employee_id, picture_name):
+    """
+    Build the derivatives of a newly saved profile picture without blocking
+    the caller (run it from transaction.on_commit). THUMBNAIL_WORKERS = 0
+    renders inline instead.
+    """
+    if not picture_name:
+        clear_thumbnails(employee_id)
+    elif settings.THUMBNAIL_WORKERS <= 0:
+        store_thumbnails(employee_id, picture_name, imaging.render_thumbnails(*render_args(picture_name)))
+    else:
+        _pool('thread').submit(_render_and_store, employee_id, picture_name)
@@ -4,14 +4,18 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('list/', views.employee_list, name='employee_list'),
+    path('api/', views.employee_api, name='employee_api'),
     path('add/', views.add_employee, name='add_employee'),
     path('edit/<int:pk>/', views.edit_employee, name='edit_employee'),
     path('delete/<int:employee_id>/', views.delete_employee, name='delete_employee'),
     path('details/<int:pk>/', views.employee_details, name='employee_details'),
+    path('photo/<int:pk>/<int:width>x<int:height>/', views.employee_photo, name='employee_photo'),
     path('files/', views.files_page, name='files'),
     path('settings/', views.settings_page, name='settings'),
 
     # Export / Import / Backup / Clear
+    path('export/jobs/<int:pk>/', views.export_job_status, name='export_job_status'),
+    path('export/jobs/<int:pk>/download/', views.export_job_download, name='export_job_download'),
     path('export/<str:format>/', views.export_employees, name='export_employees'),
     path('import/', views.import_employees, name='import_employees'),
     path('create-backup/', views.create_backup, name='create_backup'),
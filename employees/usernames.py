@@ -0,0 +1,106 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from authentication.models import EMAIL_TAKEN_MESSAGE, normalize_email_key
+
+User = get_user_model()
+
+# How many times an allocation is retried after losing a race on the unique
+# username constraint to a concurrent request.
+USERNAME_RETRIES = 5
+
+_MAX_BASE_LENGTH = 140
+
+
+def normalize_base(base_username):
+    base_username = re.sub(r'[^a-z0-9]', '', (base_username or '').lower())
+    return base_username[:_MAX_BASE_LENGTH] or 'user'
+
+
+def _stem(base):
+    # A base ending in a digit gets a separator, so 'u0' allocates 'u0_1'
+    # rather than 'u01', which reads as base 'u' with suffix '01'.
+    return f"{base}_" if base[-1].isdigit() else base
+
+
+def allocate_usernames(bases):
+    """
+    Return one free username per base name, in the same order.
+
+    Only the existing usernames this call could produce (base, optional
+    separator, digits) are read, with a single query; the lowest free numeric
+    suffix is then picked in memory. Names are only reserved in this call; the
+    unique constraint on User.username still decides the race against
+    concurrent requests (see create_user_with_username and bulk_create_users).
+    """
+    stems = [_stem(normalize_base(base)) for base in bases]
+    candidates = Q()
+    for stem in set(stems):
+        candidates |= Q(username__iregex=rf'^{re.escape(stem)}[0-9]+$')
+    taken = {
+        username.lower()
+        for username in User.objects.filter(candidates).values_list('username', flat=True)
+    }
+
+    usernames = []
+    for stem in stems:
+        counter = 1
+        while f"{stem}{counter}" in taken:
+            counter += 1
+        username = f"{stem}{counter}"
+        taken.add(username)
+        usernames.append(username)
+    return usernames
+
+
+def _lost_username_race(usernames, email_keys):
+    """
+    After an insert failed on a unique constraint: True if one of `usernames`
+    is now taken (worth allocating again). A taken email (a concurrent signup
+    with the same address, or one address twice in a batch) is a
+    ValidationError instead of a retry.
+    """
+    if User.objects.filter(username__in=usernames).exists():
+        return True
+    email_keys = [key for key in email_keys if key]
+    if len(set(email_keys)) < len(email_keys) or User.objects.filter(email_key__in=email_keys).exists():
+        raise ValidationError({'email': EMAIL_TAKEN_MESSAGE})
+    return False
+
+
+def create_user_with_username(base_username, **fields):
+    """create_user() with a freshly allocated username, retried if the name is taken meanwhile."""
+    for attempt in range(USERNAME_RETRIES):
+        username = allocate_usernames([base_username])[0]
+        try:
+            with transaction.atomic():
+                return User.objects.create_user(username=username, **fields)
+        except IntegrityError:
+            email_key = normalize_email_key(fields.get('email'))
+            if not _lost_username_race([username], [email_key]) or attempt == USERNAME_RETRIES - 1:
+                raise
+
+
+def bulk_create_users(bases, build_user):
+    """
+    bulk_create one user per base name.
+
+    build_user(username, index) returns the unsaved User for bases[index].
+    If another request grabbed one of the allocated names in the meantime the
+    whole batch is rolled back to its savepoint and allocated again; a taken
+    email is a ValidationError.
+    """
+    for attempt in range(USERNAME_RETRIES):
+        usernames = allocate_usernames(bases)
+        users = [build_user(username, index) for index, username in enumerate(usernames)]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+            return users
+        except IntegrityError:
+            if not _lost_username_race(usernames, [user.email_key for user in users]) or attempt == USERNAME_RETRIES - 1:
+                raise
@@ -1,76 +1,55 @@
 import os
-import shutil
-import random
-import string
 import json
 import traceback
 from datetime import datetime
-from io import BytesIO
-import re
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator
-from django.db.models import Q
-from django.utils import timezone
-from django.core.management import call_command
-from django.conf import settings
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from docx import Document
-from .models import Employee
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.urls import reverse
+from .models import Employee, ExportJob
 from .forms import EmployeeForm
+from .backups import stream_full_backup, write_full_backup, write_incremental_backup
+from .media_store import MediaStoreError
+from .api import API_FIELDS, list_validators, parse_fields, parse_limit, project
+from .importer import import_rows
+from .purge import purge_employees
+from .imaging import output_format
+from .photo_cache import MAX_DIMENSION, cache_key, get_rendition
+from .queries import DEFAULT_SORT_FIELD, clean_sort, filter_employees, order_employees
+from .pagination import KeysetPaginator, approximate_row_count
+from .stats import cached_dashboard_stats
+from .exports import (
+    EXPORT_JOB_FILES, RENDERERS, export_queryset, export_rows,
+    stream_csv, stream_json_array, stream_ndjson,
+)
 
 User = get_user_model()
 
 
-# ------------------------------
-# Utility: Generate unique username
-# ------------------------------
-def generate_unique_username(base_username):
-    base_username = base_username.lower().replace(" ", "")
-    for _ in range(1000):
-        random_number = random.randint(100, 999)
-        username = f"{base_username}{random_number}"
-        if not User.objects.filter(username=username).exists():
-            return username
-    counter = 1
-    while True:
-        username = f"{base_username}{counter}"
-        if not User.objects.filter(username=username).exists():
-            return username
-        counter += 1
-
-
 # ------------------------------
 # Dashboard
 # ------------------------------
 @login_required
 def dashboard(request):
-    employees = Employee.objects.all() if request.user.user_type == 'admin' else Employee.objects.filter(user=request.user)
-    total_employees = employees.count()
-    active_employees = employees.filter(user__is_active=True).count()
-    departments = employees.values('department').distinct().count()
-    current_month = timezone.now().month
-    current_year = timezone.now().year
-    new_employees = employees.filter(join_date__month=current_month, join_date__year=current_year).count()
-    recent_employees = employees.order_by('-join_date')[:5]
-    dept_list = employees.values_list('department', flat=True).distinct()
-    dept_stats = {dept: employees.filter(department=dept).count() for dept in dept_list}
+    is_admin = request.user.user_type == 'admin'
+    employees = Employee.objects.all() if is_admin else Employee.objects.filter(user=request.user)
+    stats = cached_dashboard_stats(employees, None if is_admin else request.user.id)
+    recent_employees = employees.select_related('user').order_by('-join_date')[:5]
 
     context = {
-        'total_employees': total_employees,
-        'active_employees': active_employees,
-        'departments': departments,
-        'new_employees': new_employees,
+        'total_employees': stats['total_employees'],
+        'active_employees': stats['active_employees'],
+        'departments': stats['departments'],
+        'new_employees': stats['new_employees'],
         'recent_employees': recent_employees,
-        'dept_stats': dept_stats,
+        'dept_stats': stats['dept_stats'],
     }
     return render(request, 'employees/dashboard.html', context)
 
@@ -84,42 +63,40 @@ def employee_list(request):
         messages.error(request, "You don't have permission to view this page.")
         return redirect('dashboard')
 
-    employees = Employee.objects.all()
-
-    # Filtering
+    # Filtering and searching (full-text index, see employees.search)
     department_filter = request.GET.get('department', '')
     status_filter = request.GET.get('status', '')
-    if department_filter:
-        employees = employees.filter(department__iexact=department_filter)
-    if status_filter:
-        employees = employees.filter(status__iexact=status_filter)
-
-    # Searching
     search_query = request.GET.get('search', '')
-    if search_query:
-        employees = employees.filter(
-            Q(user__first_name__icontains=search_query) |
-            Q(user__last_name__icontains=search_query) |
-            Q(user__email__icontains=search_query) |
-            Q(department__icontains=search_query) |
-            Q(position__icontains=search_query)
-        )
-
-    # Sorting
-    sort_by = request.GET.get('sort', 'user__first_name')
-    valid_sort_fields = ['user__first_name', 'department', 'join_date', 'status']
-    if sort_by not in valid_sort_fields:
-        sort_by = 'user__first_name'
-    employees = employees.order_by(sort_by)
-
-    # Pagination
-    paginator = Paginator(employees, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    employees = filter_employees(department_filter, status_filter, search_query)
+
+    # Sorting (search results default to relevance)
+    sort_by = clean_sort(request.GET.get('sort', DEFAULT_SORT_FIELD))
+    relevance_order = bool(search_query) and 'sort' not in request.GET
+    employees = order_employees(employees, sort_by, relevance_order)
+
+    # Pagination: keyset (?paging=keyset, then ?cursor=...) avoids COUNT(*) and
+    # OFFSET; page numbers remain the default and the fallback for relevance order.
+    cursor = request.GET.get('cursor', '')
+    use_keyset = not relevance_order and (cursor or request.GET.get('paging') == 'keyset')
+    total_count = None
+    if use_keyset:
+        page_obj = KeysetPaginator(employees, sort_by, 10).page(cursor)
+        if request.GET.get('count') == '1':
+            total_count = employees.count()
+        elif not (department_filter or status_filter or search_query):
+            total_count = approximate_row_count(Employee)
+    else:
+        paginator = Paginator(employees, 10)
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
 
     # Flags for template filters
     context = {
         'page_obj': page_obj,
+        'is_keyset': bool(use_keyset),
+        'next_cursor': page_obj.next_cursor if use_keyset else None,
+        'prev_cursor': page_obj.prev_cursor if use_keyset else None,
+        'total_count': total_count,
         'search_query': search_query,
         'is_hr': department_filter == 'HR',
         'is_it': department_filter == 'IT',
@@ -137,6 +114,52 @@ def employee_list(request):
 
     return render(request, 'employees/employee_list.html', context)
 
+
+# ------------------------------
+# Employee List API (read-only JSON)
+# ------------------------------
+@login_required
+def employee_api(request):
+    if request.user.user_type != 'admin':
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        limit = parse_limit(request.GET.get('limit'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # Same filters and sort as employee_list
+    search_query = request.GET.get('search', '')
+    employees = filter_employees(request.GET.get('department', ''), request.GET.get('status', ''), search_query)
+    sort_by = clean_sort(request.GET.get('sort', DEFAULT_SORT_FIELD))
+    relevance_order = bool(search_query) and 'sort' not in request.GET
+
+    # Conditional GET: one aggregate query decides whether anything changed
+    count, etag = list_validators(employees, request.GET)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        paths = [API_FIELDS[name] for name in fields]
+        payload = {'count': count}
+        if relevance_order:
+            # Relevance has no stable keyset; page numbers instead.
+            try:
+                page = max(int(request.GET.get('page', 1)), 1)
+            except ValueError:
+                return JsonResponse({'error': 'Invalid page'}, status=400)
+            start = (page - 1) * limit
+            rows = order_employees(employees, sort_by, True).values(*paths)[start:start + limit]
+            payload.update(page=page, has_next=start + limit < count)
+        else:
+            rows = KeysetPaginator(employees, sort_by, limit, values=paths).page(request.GET.get('cursor'))
+            payload.update(next_cursor=rows.next_cursor, prev_cursor=rows.prev_cursor)
+        payload['results'] = [project(row, fields) for row in rows]
+        response = JsonResponse(payload)
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
 # ------------------------------
 # Add Employee
 # ------------------------------
@@ -149,24 +172,15 @@ def add_employee(request):
     if request.method == 'POST':
         form = EmployeeForm(request.POST, request.FILES)
         if form.is_valid():
-            base_username = re.sub(r'[^a-zA-Z0-9]', '', form.cleaned_data['email'].split('@')[0])
-            username = generate_unique_username(base_username)
-            temp_password = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-
-            user = User.objects.create_user(
-                username=username,
-                email=form.cleaned_data['email'],
-                password=temp_password,
-                first_name=form.cleaned_data['first_name'],
-                last_name=form.cleaned_data['last_name'],
-                user_type='employee'
-            )
-
-            employee = form.save(commit=False)
-            employee.user = user
-            employee.save()
-
-            messages.success(request, f'Employee added successfully! Username: {username} | Temporary Password: {temp_password}')
+            # The form creates the account as configured by ACCOUNT_PROVISIONING
+            employee = form.save()
+            username = employee.user.username
+
+            if 'activation_path' in form.credentials:
+                activation_url = request.build_absolute_uri(form.credentials['activation_path'])
+                messages.success(request, f'Employee added successfully! Username: {username} | Activation link: {activation_url}')
+            else:
+                messages.success(request, f'Employee added successfully! Username: {username} | Temporary Password: {form.credentials["temporary_password"]}')
             return redirect('employee_list')
         else:
             messages.error(request, 'Please correct the errors below.')
@@ -239,120 +253,101 @@ def delete_employee(request, employee_id):
     return render(request, 'employees/delete_employee.html', {'employee': employee})
 
 # ------------------------------
+def _export_job_payload(job):
+    payload = {
+        'id': job.id,
+        'format': job.format,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'status_url': reverse('export_job_status', args=[job.id]),
+    }
+    if job.is_ready:
+        payload['download_url'] = reverse('export_job_download', args=[job.id])
+    if job.status == 'failed':
+        payload['error'] = 'Export failed. Please try again.'
+    return payload
+
+
 @login_required
 def export_employees(request, format):
-    employees = Employee.objects.select_related('user').all()
+    after_id = request.GET.get('after_id')
+    if after_id:
+        try:
+            after_id = int(after_id)
+        except ValueError:
+            return HttpResponse("Invalid after_id", status=400)
+    else:
+        after_id = None
+    rows = export_rows(export_queryset(after_id))
 
-    # CSV
+    # CSV (streamed straight off the database cursor)
     if format.lower() == 'csv':
-        import csv
-        response = HttpResponse(content_type='text/csv')
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="employees.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['First Name', 'Last Name', 'Department', 'Email', 'Phone', 'Address', 'Join Date', 'Position', 'Status'])
-        for e in employees:
-            writer.writerow([
-                e.user.first_name if e.user else 'N/A',
-                e.user.last_name if e.user else 'N/A',
-                e.department, e.email, e.phone or '', e.address or '',
-                str(e.join_date), e.position, e.status
-            ])
         return response
 
-    # JSON
-    elif format.lower() == 'json':
-        data = []
-        for e in employees:
-            data.append({
-                'first_name': e.user.first_name if e.user else 'N/A',
-                'last_name': e.user.last_name if e.user else 'N/A',
-                'department': e.department,
-                'email': e.email,
-                'phone': e.phone or '',
-                'address': e.address or '',
-                'join_date': str(e.join_date),
-                'position': e.position,
-                'status': e.status
-            })
-        return JsonResponse(data, safe=False)
-
-    # Word
-    elif format.lower() == 'word':
-        document = Document()
-        document.add_heading("Employee Report", level=1)
-        table = document.add_table(rows=1, cols=9)
-        table.style = 'LightShading-Accent1'
-        headers = ['First Name', 'Last Name', 'Department', 'Email', 'Phone', 'Address', 'Join Date', 'Position', 'Status']
-        for i, header in enumerate(headers):
-            table.rows[0].cells[i].text = header
-        for e in employees:
-            row_cells = table.add_row().cells
-            row_cells[0].text = e.user.first_name if e.user else 'N/A'
-            row_cells[1].text = e.user.last_name if e.user else 'N/A'
-            row_cells[2].text = e.department
-            row_cells[3].text = e.email
-            row_cells[4].text = e.phone or ''
-            row_cells[5].text = e.address or ''
-            row_cells[6].text = str(e.join_date)
-            row_cells[7].text = e.position
-            row_cells[8].text = e.status
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-        response['Content-Disposition'] = 'attachment; filename="employees.docx"'
-        document.save(response)
+    # JSON array / newline-delimited JSON (streamed, resumable with ?after_id=)
+    elif format.lower() in ('json', 'ndjson'):
+        if format.lower() == 'json':
+            response = StreamingHttpResponse(stream_json_array(rows), content_type='application/json')
+        else:
+            response = StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson')
+            response['Content-Disposition'] = 'attachment; filename="employees.ndjson"'
         return response
 
-    # PDF
-    elif format.lower() == 'pdf':
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        elements = []
-        styles = getSampleStyleSheet()
-        elements.append(Paragraph("Employee Report", styles['Heading1']))
-        data = [['First Name', 'Last Name', 'Department', 'Email', 'Phone', 'Address', 'Join Date', 'Position', 'Status']]
-        for e in employees:
-            data.append([
-                e.user.first_name if e.user else 'N/A',
-                e.user.last_name if e.user else 'N/A',
-                e.department, e.email, e.phone or '', e.address or '',
-                str(e.join_date), e.position, e.status
-            ])
-        table = Table(data, repeatRows=1)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#d9d9d9')),
-            ('TEXTCOLOR',(0,0),(-1,0),colors.black),
-            ('ALIGN',(0,0),(-1,-1),'CENTER'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 12),
-            ('BOTTOMPADDING', (0,0), (-1,0), 8),
-            ('GRID', (0,0), (-1,-1), 1, colors.black)
-        ]))
-        elements.append(table)
-        doc.build(elements)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="employees.pdf"'
-        response.write(buffer.getvalue())
-        buffer.close()
-        return response
+    # Word / PDF (rendered by the export worker, see run_export_worker)
+    elif format.lower() in RENDERERS:
+        job = ExportJob.objects.create(requested_by=request.user, format=format.lower())
+        return JsonResponse(_export_job_payload(job), status=202)
 
     else:
         return HttpResponse("Unsupported format", status=400)
 
 
+def _get_export_job(request, pk):
+    job = get_object_or_404(ExportJob, pk=pk)
+    if request.user.user_type != 'admin' and job.requested_by_id != request.user.id:
+        return None
+    return job
+
+
+@login_required
+def export_job_status(request, pk):
+    job = _get_export_job(request, pk)
+    if job is None:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    return JsonResponse(_export_job_payload(job))
+
+
+@login_required
+def export_job_download(request, pk):
+    job = _get_export_job(request, pk)
+    if job is None:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    if not job.is_ready:
+        return JsonResponse(_export_job_payload(job), status=409)
+    filename, content_type = EXPORT_JOB_FILES[job.format]
+    return FileResponse(job.artifact.open('rb'), as_attachment=True, filename=filename, content_type=content_type)
+
+
 # ------------------------------
 # Clear All Data
 # ------------------------------
 @login_required
 def clear_all_data(request):
+    if request.user.user_type != 'admin':
+        messages.error(request, "You don't have permission to clear data.")
+        return redirect('dashboard')
+
     if request.method != 'POST':
         messages.error(request, "Invalid request method.")
         return redirect('employee_list')
 
     try:
-        employees = Employee.objects.select_related('user').all()
-        for emp in employees:
-            if emp.user:
-                emp.user.delete()
-        messages.success(request, "All employee data cleared successfully.")
+        # Batched set-based deletes; photo files are removed in the background
+        deleted = purge_employees()
+        messages.success(request, f"All employee data cleared successfully ({deleted} employees removed).")
         return redirect('employee_list')
     except Exception as e:
         traceback.print_exc()
@@ -369,14 +364,13 @@ def create_backup(request):
         messages.error(request, "You don't have permission to create backups.")
         return redirect('dashboard')
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_dir = os.path.join(settings.BASE_DIR, "backups")
-    os.makedirs(backup_dir, exist_ok=True)
-    backup_filename = f"backup_{timestamp}.json"
-    backup_path = os.path.join(backup_dir, backup_filename)
-
-    with open(backup_path, "w", encoding="utf-8") as f:
-        call_command("dumpdata", "--exclude", "sessions", "--indent", "2", stdout=f)
+    # ?mode=incremental writes only what changed since the last backup
+    # (restore with `manage.py restore_backup_chain`).
+    if request.GET.get('mode') == 'incremental':
+        backup_path, _kind = write_incremental_backup()
+    else:
+        backup_path = write_full_backup()
+    backup_filename = os.path.basename(backup_path)
 
     with open(backup_path, "rb") as f:
         response = HttpResponse(f.read(), content_type="application/json")
@@ -391,28 +385,17 @@ def create_full_backup(request):
         return redirect('dashboard')
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_dir = os.path.join(settings.BASE_DIR, "backups", f"backup_{timestamp}")
-    os.makedirs(backup_dir, exist_ok=True)
-
-    # Database backup
-    db_file = os.path.join(backup_dir, "db_backup.json")
-    with open(db_file, "w", encoding="utf-8") as f:
-        call_command("dumpdata", "--exclude", "sessions", "--indent", "2", stdout=f)
-
-    # Media backup
-    media_dir = os.path.join(settings.BASE_DIR, "media")
-    if os.path.exists(media_dir):
-        shutil.copytree(media_dir, os.path.join(backup_dir, "media"))
-
-    # Create ZIP
     zip_filename = f"backup_{timestamp}.zip"
-    zip_path = os.path.join(settings.BASE_DIR, "backups", zip_filename)
-    shutil.make_archive(zip_path.replace(".zip", ""), "zip", backup_dir)
 
-    with open(zip_path, "rb") as f:
-        response = HttpResponse(f.read(), content_type="application/zip")
-        response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
-        return response
+    # Database dump + media, zipped on the fly (no staging copy, bounded memory).
+    # ?since=<media_snapshot name of an earlier archive> leaves out unchanged media.
+    try:
+        archive = stream_full_backup(since=request.GET.get('since') or None)
+    except MediaStoreError as e:
+        return HttpResponse(str(e), status=400)
+    response = StreamingHttpResponse(archive, content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
+    return response
 
 
 # ------------------------------
@@ -437,6 +420,34 @@ def employee_details(request, pk):
     return render(request, 'employees/employee_details.html', {'employee': employee})
 
 
+# ------------------------------
+# Resized Photos
+# ------------------------------
+@login_required
+def employee_photo(request, pk, width, height):
+    if not (0 < width <= MAX_DIMENSION and 0 < height <= MAX_DIMENSION):
+        return HttpResponse("Invalid size", status=400)
+
+    picture = get_object_or_404(Employee.objects.only('profile_picture'), pk=pk).profile_picture
+    if not picture:
+        return HttpResponse("No photo", status=404)
+    crop = request.GET.get('crop') == '1'
+    try:
+        key = cache_key(picture.path, width, height, crop)
+    except FileNotFoundError:
+        return HttpResponse("No photo", status=404)
+
+    # Strong ETag: the key changes whenever the source file or the size does
+    etag = f'"{key}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        path = get_rendition(picture.path, width, height, crop, key=key)
+        response = FileResponse(open(path, 'rb'), content_type=f'image/{output_format().lower()}')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=settings.PHOTO_CACHE_MAX_AGE)
+    return response
+
+
 # ------------------------------
 # Import Employees (JSON)
 # ------------------------------
@@ -451,45 +462,11 @@ def import_employees(request):
 
     try:
         data = json.loads(request.body)
-        count = 0
-        for item in data:
-            email = item.get('email')
-            first_name = item.get('first_name')
-            last_name = item.get('last_name')
-            department = item.get('department', '')
-            position = item.get('position', '')
-            status = item.get('status', 'active')
-
-            if not email:
-                continue
-
-            if Employee.objects.filter(user__email=email).exists():
-                continue
-
-            temp_password = 'Temp1234'
-            username = generate_unique_username(email.split('@')[0])
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password=temp_password,
-                first_name=first_name,
-                last_name=last_name,
-                user_type='employee'
-            )
-
-            Employee.objects.create(
-                user=user,
-                department=department,
-                position=position,
-                status=status
-            )
-            count += 1
-
-        return JsonResponse({'success': True, 'imported_count': count})
+        if not isinstance(data, list):
+            return JsonResponse({'error': 'Expected a JSON array of employees'}, status=400)
+        result = import_rows(data)
+        return JsonResponse({'success': True, **result})
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
-    
-   
- 